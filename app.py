@@ -1,4 +1,5 @@
 import os
+import uuid
 import logging
 from rich.logging import RichHandler
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
@@ -7,8 +8,25 @@ import matplotlib
 matplotlib.use("Agg")
 
 # Initialize database before importing routes
-from app.models import init_db, get_db
+from app.models import init_db, get_storage
 from app.models.student import Student
+from app.models.submissions import submission_registry
+from app.models.http_pool import pool_metrics
+from app.services.mapping_service import (
+    mapping_cache,
+    mapping_cache_key,
+    cached_mappings,
+    invalidate_mapping_cache,
+)
+from app.services.reference_data import get_reference_lists, invalidate_reference_data
+from app.services.query_batch import gather
+from app.services.feedback_service import (
+    batch_range_exceeded,
+    collect_rating_rows,
+    mapping_rows,
+    mapping_semester_variations,
+    rating_payload,
+)
 from routes.hod_routes import hod_bp
 from routes.admin_routes import admin_bp
 from rich.console import Console
@@ -19,10 +37,13 @@ from utils import (
     normalize_regno,
 )
 from config import (
+    ASYNC_STUDENT_ROUTES,
     FEEDBACK_QUESTIONS,
     UPLOAD_FOLDER,
 )
 from asgiref.wsgi import WsgiToAsgi
+from routes.student_async import create_asgi_app
+from app.services.startup import warm_up
 
 # Configure rich logging
 logging.basicConfig(
@@ -60,7 +81,14 @@ app.register_blueprint(admin_bp)
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-asgi_app = WsgiToAsgi(app)
+# Student login and feedback run natively on the event loop; the rest is Flask.
+# The ASGI app warms clients and caches in each worker's lifespan startup.
+if ASYNC_STUDENT_ROUTES:
+    asgi_app = create_asgi_app(app)
+else:
+    # WsgiToAsgi has no lifespan, so warm up when the worker imports the app
+    warm_up(app)
+    asgi_app = WsgiToAsgi(app)
 
 
 def get_student_info_db(registerno):
@@ -70,117 +98,92 @@ def get_student_info_db(registerno):
     return student
 
 
+def get_login_info_db(registerno):
+    """Get student info, submission status and batch range in one lookup."""
+    reg_num = normalize_regno(registerno)
+    login_info = Student.login_lookup(reg_num)
+    if login_info and login_info["submitted"]:
+        submission_registry.add(reg_num)
+    return login_info
+
+
 def has_submitted_feedback_db(registerno):
     """Check if student has submitted feedback."""
     reg_num = normalize_regno(registerno)
-    client = get_db()
+    if submission_registry.contains(reg_num):
+        return True
+    if submission_registry.is_warm:
+        return False
 
+    # Registry unavailable (e.g. warm-up failed), ask the database directly
     try:
-        result = (
-            client.table("submitted_feedback")
-            .select("id")
-            .eq("registerno", reg_num)
-            .execute()
-        )
-        return len(result.data) > 0
+        submitted = get_storage().has_submitted(reg_num)
+        if submitted:
+            submission_registry.add(reg_num)
+        return submitted
     except Exception as e:
         logger.error(f"Error checking feedback submission: {e}")
         return False
 
 
 def load_admin_mapping_db(department, semester):
-    """Load admin mappings from database."""
-    client = get_db()
+    """Load admin mappings, served from the mapping cache when possible."""
+    key = mapping_cache_key(department, semester)
+    mappings = cached_mappings(key)
+    if mappings is not None:
+        return mappings
 
     # Normalize semester to match database format (handle inconsistencies)
-    sem_variations = [
-        semester,
-        f"Semester {semester}",
-        f"Semester Semester {semester}",
-        semester.replace("Semester", "").strip(),
-    ]
+    sem_variations = mapping_semester_variations(key[1])
 
     try:
-        result = (
-            client.table("admin_mappings")
-            .select("department, semester, staff, subject")
-            .eq("department", department)
-            .in_("semester", sem_variations)
-            .execute()
-        )
-
-        mappings = []
-        for row in result.data:
-            mappings.append(
-                {
-                    "department": row["department"],
-                    "semester": row["semester"],
-                    "staff": row["staff"],
-                    "subject": row["subject"],
-                }
-            )
+        mappings = mapping_rows(get_storage().load_mappings(department, sem_variations))
 
+        # Empty results are cached too; the mapping version check invalidates them
+        mapping_cache.set(key, mappings)
         return mappings
     except Exception as e:
         logger.error(f"Error loading admin mappings: {e}")
         return []
 
 
-def append_ratings_db(rating_rows):
-    """Append ratings to database."""
-    client = get_db()
+def append_ratings_db(rating_rows, submission_token=None):
+    """Append ratings to database in a single atomic, idempotent call.
 
-    for row in rating_rows:
-        try:
-            # Insert rating
-            client.table("ratings").insert(
-                {
-                    "registerno": row["registerno"],
-                    "department": row["department"],
-                    "semester": row["semester"],
-                    "staff": row["staff"],
-                    "subject": row["subject"],
-                    "q1": float(row["q1"]),
-                    "q2": float(row["q2"]),
-                    "q3": float(row["q3"]),
-                    "q4": float(row["q4"]),
-                    "q5": float(row["q5"]),
-                    "q6": float(row["q6"]),
-                    "q7": float(row["q7"]),
-                    "q8": float(row["q8"]),
-                    "q9": float(row["q9"]),
-                    "q10": float(row["q10"]),
-                    "average": float(row["average"]),
-                }
-            ).execute()
+    Returns 'created' for a new submission, 'replayed' when a retry with the
+    same submission token hits an already stored submission, 'duplicate' when
+    the student submitted before under another token, or None on error.
+    """
+    if not rating_rows:
+        return None
 
-            # Mark as submitted (upsert to handle duplicates)
-            try:
-                client.table("submitted_feedback").insert(
-                    {"registerno": row["registerno"]}
-                ).execute()
-            except:
-                # Ignore if already exists
-                pass
-        except Exception as e:
-            logger.error(f"Error appending rating for {row.get('registerno')}: {e}")
+    registerno = rating_rows[0]["registerno"]
+    payload = rating_payload(rating_rows)
+
+    try:
+        status = get_storage().submit_feedback(registerno, submission_token, payload)
+    except Exception as e:
+        logger.error(f"Error appending ratings for {registerno}: {e}")
+        return None
+
+    submission_registry.add(registerno)
+    return status
 
 
 @app.route("/add_staff", methods=["POST"])
 def add_staff():
     staff_name = request.form.get("staff_name", "").strip()
     if staff_name:
-        client = get_db()
+        storage = get_storage()
         try:
             # Check if staff already exists
-            existing = (
-                client.table("staff").select("id").eq("name", staff_name).execute()
-            )
+            existing = storage.existing_reference_names("staff", [staff_name])
 
-            if existing.data:
+            if existing:
                 flash("Staff already exists", "danger")
             else:
-                client.table("staff").insert({"name": staff_name}).execute()
+                storage.insert_reference_names("staff", [staff_name])
+                invalidate_reference_data("staff")
                 flash("Staff added successfully!", "success")
                 return {"success": True, "message": "Staff added successfully!"}
         except Exception as e:
@@ -193,17 +196,16 @@ def add_staff():
 def add_subject():
     subject_name = request.form.get("subject_name", "").strip()
     if subject_name:
-        client = get_db()
+        storage = get_storage()
         try:
             # Check if subject already exists
-            existing = (
-                client.table("subjects").select("id").eq("name", subject_name).execute()
-            )
+            existing = storage.existing_reference_names("subjects", [subject_name])
 
-            if existing.data:
+            if existing:
                 flash("Subject already exists", "danger")
             else:
-                client.table("subjects").insert({"name": subject_name}).execute()
+                storage.insert_reference_names("subjects", [subject_name])
+                invalidate_reference_data("subjects")
                 flash("Subject added successfully!", "success")
                 return {"success": True, "message": "Subject added successfully!"}
         except Exception as e:
@@ -240,11 +242,11 @@ def validate_regno():
                 }
             )
 
-        student_info = get_student_info_db(registerno)
-        if not student_info:
+        login_info = get_login_info_db(registerno)
+        if not login_info:
             return jsonify({"valid": False, "message": "Registration number not found"})
 
-        if has_submitted_feedback_db(registerno):
+        if login_info["submitted"]:
             return jsonify(
                 {
                     "valid": False,
@@ -253,35 +255,14 @@ def validate_regno():
             )
 
         # Check registration number range
-        department = student_info.get("department")
-        semester = student_info.get("semester")
-
-        client = get_db()
-        try:
-            result = (
-                client.table("students")
-                .select("registerno")
-                .eq("department", department)
-                .eq("semester", semester)
-                .execute()
+        if batch_range_exceeded(login_info):
+            return jsonify(
+                {
+                    "valid": False,
+                    "message": "Registration number range exceeds limit for your batch",
+                }
             )
 
-            reg_nums = [int(row["registerno"]) for row in result.data]
-        except Exception as e:
-            logger.error(f"Error fetching student registration numbers: {e}")
-            reg_nums = []
-
-        if reg_nums:
-            min_reg = min(reg_nums)
-            max_reg = max(reg_nums)
-            if (max_reg - min_reg) > 600:
-                return jsonify(
-                    {
-                        "valid": False,
-                        "message": "Registration number range exceeds limit for your batch",
-                    }
-                )
-
         return jsonify(
             {"valid": True, "message": "Registration number validated successfully!"}
         )
@@ -312,40 +293,22 @@ def student_login():
                 flash("Registration number must be a positive number.", "danger")
                 return render_template("student_login.html")
 
-            student_info = get_student_info_db(registerno)
-            if not student_info:
+            login_info = get_login_info_db(registerno)
+            if not login_info:
                 flash("Registration number not found. Please try again.", "danger")
                 return render_template("student_login.html")
 
-            department = student_info.get("department")
-            semester = student_info.get("semester")
+            department = login_info.get("department")
+            semester = login_info.get("semester")
 
-            client = get_db()
-            try:
-                result = (
-                    client.table("students")
-                    .select("registerno")
-                    .eq("department", department)
-                    .eq("semester", semester)
-                    .execute()
+            if batch_range_exceeded(login_info):
+                flash(
+                    "Registration number range exceeds limit for your batch.",
+                    "danger",
                 )
+                return render_template("student_login.html")
 
-                reg_nums = [int(row["registerno"]) for row in result.data]
-            except Exception as e:
-                logger.error(f"Error fetching student registration numbers: {e}")
-                reg_nums = []
-
-            if reg_nums:
-                min_reg = min(reg_nums)
-                max_reg = max(reg_nums)
-                if (max_reg - min_reg) > 600:
-                    flash(
-                        "Registration number range exceeds limit for your batch.",
-                        "danger",
-                    )
-                    return render_template("student_login.html")
-
-            if has_submitted_feedback_db(registerno):
+            if login_info["submitted"]:
                 flash(
                     "Feedback already submitted for this registration number.", "info"
                 )
@@ -385,22 +348,26 @@ def admin_dashboard():
     return render_template("admin_dashboard.html")
 
 
+@app.route("/metrics/db_pool")
+def db_pool_metrics():
+    """Supabase HTTP pool settings and metrics for this worker process."""
+    return jsonify(pool_metrics())
+
+
 @app.route("/admin_students")
 def admin_students():
     """Student management page - FIXED to use actual student data"""
-    client = get_db()
+    storage = get_storage()
 
     try:
-        # Get distinct departments from students table
-        dept_result = (
-            client.table("students").select("department").order("department").execute()
+        # Distinct departments and semesters from the students table, read concurrently
+        dept_values, sem_values = gather(
+            (("student_values", "department"), storage.student_values, "department"),
+            (("student_values", "semester"), storage.student_values, "semester"),
         )
-        departments = sorted(list(set([row["department"] for row in dept_result.data])))
-
-        # Get distinct semesters from students table
-        sem_result = client.table("students").select("semester").execute()
+        departments = sorted(set(dept_values))
         semesters = sorted(
-            list(set([row["semester"] for row in sem_result.data])),
+            set(sem_values),
             key=lambda x: int(x) if x.isdigit() else 0,
         )
     except Exception as e:
@@ -415,20 +382,12 @@ def admin_students():
 
 @app.route("/admin", methods=["GET", "POST"])
 def admin():
-    client = get_db()
+    storage = get_storage()
 
     try:
-        dept_result = client.table("departments").select("name").order("name").execute()
-        departments = [row["name"] for row in dept_result.data]
-
-        sem_result = client.table("semesters").select("name").order("name").execute()
-        semesters = [row["name"] for row in sem_result.data]
-
-        staff_result = client.table("staff").select("name").order("name").execute()
-        staffs = [row["name"] for row in staff_result.data]
-
-        subj_result = client.table("subjects").select("name").order("name").execute()
-        subjects = [row["name"] for row in subj_result.data]
+        departments, semesters, staffs, subjects = get_reference_lists(
+            "departments", "semesters", "staff", "subjects"
+        )
     except Exception as e:
         logger.error(f"Error loading admin data: {e}")
         departments = []
@@ -458,13 +417,11 @@ def admin():
         else:
             try:
                 # Delete existing mappings
-                client.table("admin_mappings").delete().eq("department", department).eq(
-                    "semester", semester
-                ).execute()
+                storage.delete_mappings(department, semester)
 
                 # Insert new mappings
-                for mapping in new_mappings:
-                    client.table("admin_mappings").insert(mapping).execute()
+                storage.insert_mappings(new_mappings)
+                invalidate_mapping_cache(department, semester)
 
                 flash("Mapping(s) saved successfully.", "success")
             except Exception as e:
@@ -492,7 +449,9 @@ def feedback():
         flash("Missing department, semester, or registration number.", "danger")
         return redirect(url_for("student_login"))
 
-    if has_submitted_feedback_db(registerno):
+    # POSTs skip this check: submit_feedback() does it atomically so that a
+    # retried submission can still be recognised as the original one
+    if request.method == "GET" and has_submitted_feedback_db(registerno):
         flash("Feedback already submitted. You have already registered.", "info")
         return redirect(url_for("student_login"))
 
@@ -503,51 +462,14 @@ def feedback():
         )
 
     if request.method == "POST":
-        if has_submitted_feedback_db(registerno):
-            flash("Feedback already submitted. You have already registered.", "info")
-            return redirect(url_for("student_login"))
+        submission_token = request.form.get("submission_token") or None
 
-        rating_rows = []
-        error_flag = False
-
-        for idx, mapping in enumerate(mappings):
-            ratings_dict = {}
-            ratings = []
-            for q in range(1, 11):
-                key = f"rating-{idx}-{q}"
-                value = request.form.get(key)
-                if not value:
-                    flash(
-                        f"Please fill all rating boxes for {mapping['staff']}.",
-                        "danger",
-                    )
-                    error_flag = True
-                    break
-                try:
-                    score = float(value)
-                except ValueError:
-                    flash(f"Invalid rating value for {mapping['staff']}.", "danger")
-                    error_flag = True
-                    break
-                ratings.append(score)
-                ratings_dict[f"q{q}"] = f"{score:.2f}"
-
-            if error_flag:
-                break
-
-            average = sum(ratings) / len(ratings)
-            row_data = {
-                "registerno": registerno,  # Store registerno without encryption
-                "department": department,
-                "semester": semester,
-                "staff": mapping["staff"],
-                "subject": mapping["subject"],
-                "average": f"{average:.2f}",
-            }
-            row_data.update(ratings_dict)
-            rating_rows.append(row_data)
+        rating_rows, error = collect_rating_rows(
+            request.form, mappings, department, semester, registerno
+        )
 
-        if error_flag:
+        if error:
+            flash(error, "danger")
             return redirect(
                 url_for(
                     "feedback",
@@ -557,7 +479,20 @@ def feedback():
                 )
             )
         else:
-            append_ratings_db(rating_rows)
+            status = append_ratings_db(rating_rows, submission_token)
+            if status == "duplicate":
+                flash("Feedback already submitted. You have already registered.", "info")
+                return redirect(url_for("student_login"))
+            if status is None:
+                flash("Could not save your feedback. Please try again.", "danger")
+                return redirect(
+                    url_for(
+                        "feedback",
+                        department=department,
+                        semester=semester,
+                        registerno=registerno,
+                    )
+                )
             flash("Feedback submitted successfully. Thank you!", "success")
             return redirect(url_for("student_login"))
 
@@ -567,6 +502,7 @@ def feedback():
         semester=semester,
         mappings=mappings,
         questions=FEEDBACK_QUESTIONS,
+        submission_token=uuid.uuid4().hex,
     )
 
 
@@ -1,4 +1,5 @@
-from .database import init_db, get_db, get_db_path
+from .database import init_db, get_db, get_db_path, fetch_all
+from .storage import get_storage
 from .student import Student
 
-__all__ = ['init_db', 'get_db', 'get_db_path', 'Student']
+__all__ = ['init_db', 'get_db', 'get_db_path', 'fetch_all', 'get_storage', 'Student']
@@ -0,0 +1,90 @@
+"""
+Async counterparts of the storage operations on the student hot path
+(login lookup, submission check, mappings, submit).
+
+With the supabase backend the calls go through the async Supabase client, so
+a request waiting on PostgREST holds no thread. Other backends run their
+synchronous implementation in the default thread pool.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+from .storage import get_storage, StorageBackend
+from .supabase_db import get_async_supabase_client
+
+logger = logging.getLogger(__name__)
+
+class AsyncSupabaseStorage:
+    name = 'supabase'
+
+    async def ping(self):
+        client = await get_async_supabase_client()
+        await client.table('student_batch_ranges').select('department').limit(1).execute()
+
+    async def login_lookup(self, registerno: str) -> Optional[dict]:
+        client = await get_async_supabase_client()
+        result = await client.rpc('login_lookup', {'p_registerno': registerno}).execute()
+        return result.data[0] if result.data else None
+
+    async def has_submitted(self, registerno: str) -> bool:
+        client = await get_async_supabase_client()
+        result = await client.table('submitted_feedback')\
+            .select('id')\
+            .eq('registerno', registerno)\
+            .limit(1)\
+            .execute()
+        return bool(result.data)
+
+    async def load_mappings(self, department: str, semesters: List[str]) -> List[dict]:
+        client = await get_async_supabase_client()
+        result = await client.table('admin_mappings')\
+            .select('department, semester, staff, subject')\
+            .eq('department', department)\
+            .in_('semester', semesters)\
+            .execute()
+        return result.data
+
+    async def submit_feedback(self, registerno: str, token: Optional[str], ratings: List[dict]) -> str:
+        client = await get_async_supabase_client()
+        result = await client.rpc('submit_feedback', {
+            'p_registerno': registerno,
+            'p_token': token,
+            'p_ratings': ratings
+        }).execute()
+        return result.data[0]['status']
+
+class ThreadedStorage:
+    """Runs a synchronous StorageBackend off the event loop."""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+        self.name = storage.name
+
+    async def ping(self):
+        await asyncio.to_thread(self.storage.ping)
+
+    async def login_lookup(self, registerno):
+        return await asyncio.to_thread(self.storage.login_lookup, registerno)
+
+    async def has_submitted(self, registerno):
+        return await asyncio.to_thread(self.storage.has_submitted, registerno)
+
+    async def load_mappings(self, department, semesters):
+        return await asyncio.to_thread(self.storage.load_mappings, department, semesters)
+
+    async def submit_feedback(self, registerno, token, ratings):
+        return await asyncio.to_thread(self.storage.submit_feedback, registerno, token, ratings)
+
+_async_storage = None
+
+def get_async_storage():
+    """Async storage matching the configured STORAGE_BACKEND."""
+    global _async_storage
+    if _async_storage is None:
+        storage = get_storage()
+        if storage.name == 'supabase':
+            _async_storage = AsyncSupabaseStorage()
+        else:
+            _async_storage = ThreadedStorage(storage)
+    return _async_storage
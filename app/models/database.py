@@ -2,6 +2,7 @@ import os
 import logging
 from supabase import Client
 from dotenv import load_dotenv
+import config
 from app.models.supabase_db import get_supabase_client, init_db as init_supabase_db
 
 load_dotenv()
@@ -12,12 +13,33 @@ def get_db() -> Client:
     """Get Supabase client instance."""
     return get_supabase_client()
 
+def fetch_all(build_query, page_size=1000):
+    """
+    Run a select page by page until every row is fetched.
+    PostgREST caps a single response (1000 rows by default), so large reads
+    must be paged. `build_query` returns a fresh, ordered select builder.
+    """
+    rows = []
+    start = 0
+    while True:
+        result = build_query().range(start, start + page_size - 1).execute()
+        rows.extend(result.data)
+        if len(result.data) < page_size:
+            return rows
+        start += page_size
+
 def get_db_path():
-    """Legacy function - not used with Supabase."""
-    logger.warning("get_db_path() is deprecated when using Supabase")
+    """Path of the local database file, or None when using Supabase."""
+    if config.STORAGE_BACKEND == 'sqlite':
+        return config.DATABASE_PATH
     return None
 
 def init_db():
-    """Initialize the Supabase database connection."""
+    """Initialize the configured database (Supabase connection or local SQLite file)."""
+    if config.STORAGE_BACKEND == 'sqlite':
+        from app.models.storage import get_storage
+        get_storage().conn
+        logger.info(f"SQLite database initialized at {config.DATABASE_PATH}")
+        return
     init_supabase_db()
     logger.info("Supabase database initialized")
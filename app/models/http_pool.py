@@ -0,0 +1,260 @@
+"""
+HTTP connection pool shared by the Supabase clients.
+
+supabase-py builds its own httpx client with library defaults; here the pool
+size, keep-alive, HTTP/2, timeouts and retries come from the environment so
+bursts of logins are spread over enough (long-lived) connections:
+
+    SUPABASE_MAX_CONNECTIONS   open connections per client (default 100)
+    SUPABASE_MAX_KEEPALIVE     idle connections kept open (default 20)
+    SUPABASE_KEEPALIVE_EXPIRY  seconds an idle connection is kept (default 30)
+    SUPABASE_HTTP2             multiplex requests over HTTP/2 (default 1)
+    SUPABASE_CONNECT_TIMEOUT   seconds (default 5)
+    SUPABASE_READ_TIMEOUT      seconds, also used for writes (default 30)
+    SUPABASE_POOL_TIMEOUT      seconds to wait for a free connection (default 10)
+    SUPABASE_RETRIES           retries after a failed attempt (default 2)
+    SUPABASE_RETRY_BACKOFF     first retry delay in seconds, doubled per retry (default 0.2)
+
+Requests are retried when no connection could be made (safe for any method)
+and, for GET/HEAD and read-only RPC calls only, on dropped connections and
+502/503/504 responses.
+
+pool_metrics() reports connection counts and how long requests waited for a
+connection, for monitoring.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv('SUPABASE_MAX_CONNECTIONS', '100'))
+MAX_KEEPALIVE = int(os.getenv('SUPABASE_MAX_KEEPALIVE', '20'))
+KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '30'))
+HTTP2 = os.getenv('SUPABASE_HTTP2', '1').strip().lower() not in ('0', 'false', 'no')
+CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('SUPABASE_READ_TIMEOUT', '30'))
+POOL_TIMEOUT = float(os.getenv('SUPABASE_POOL_TIMEOUT', '10'))
+RETRIES = int(os.getenv('SUPABASE_RETRIES', '2'))
+RETRY_BACKOFF = float(os.getenv('SUPABASE_RETRY_BACKOFF', '0.2'))
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+RPC_PATH = '/rest/v1/rpc/'
+# PostgREST calls functions with POST; these only read, so they retry like GETs.
+# submit_feedback stays out: a retried call without a submission token would be
+# reported as a duplicate of the attempt that actually succeeded.
+READ_ONLY_RPCS = frozenset({'login_lookup', 'class_rating_summary', 'class_non_submissions'})
+RETRY_STATUS_CODES = (502, 503, 504)
+# No connection was made, so the server never saw the request
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# The connection dropped mid-request (e.g. a stale keep-alive connection)
+TRANSPORT_ERRORS = (httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError)
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+def pool_timeout() -> httpx.Timeout:
+    return httpx.Timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT,
+                         write=READ_TIMEOUT, pool=POOL_TIMEOUT)
+
+def retry_delay(attempt: int) -> float:
+    return RETRY_BACKOFF * (2 ** attempt)
+
+def is_idempotent(request: httpx.Request) -> bool:
+    if request.method in IDEMPOTENT_METHODS:
+        return True
+    _, rpc, function = request.url.path.rpartition(RPC_PATH)
+    return request.method == 'POST' and bool(rpc) and function in READ_ONLY_RPCS
+
+def should_retry(request: httpx.Request, attempt: int, error: Exception = None,
+                 response: httpx.Response = None) -> bool:
+    if attempt >= RETRIES:
+        return False
+    if error is not None:
+        if isinstance(error, CONNECT_ERRORS):
+            return True
+        return isinstance(error, TRANSPORT_ERRORS) and is_idempotent(request)
+    return response.status_code in RETRY_STATUS_CODES and is_idempotent(request)
+
+# httpcore trace events marking the moment a request got a connection
+_CONNECTION_EVENTS = ('connection.connect_tcp.started', 'send_request_headers.started')
+
+class PoolMetrics:
+    """Request counters and connection wait times for one client."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.pool = None
+        self.requests = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waited = 0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def finished(self, error: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            if error:
+                self.errors += 1
+
+    def retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waited += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def connection_counts(self) -> dict:
+        connections = list(getattr(self.pool, 'connections', None) or [])
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {'connections': len(connections), 'idle': idle, 'in_use': len(connections) - idle}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {
+                'requests': self.requests,
+                'in_flight': self.in_flight,
+                'retries': self.retries,
+                'errors': self.errors,
+                'wait_avg_ms': round(self.wait_total / self.waited * 1000, 2) if self.waited else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 2)
+            }
+        stats.update(self.connection_counts())
+        return stats
+
+class _WaitTimer:
+    """Measures the time from sending a request to it getting a connection."""
+
+    def __init__(self, metrics: PoolMetrics, trace=None):
+        self.metrics = metrics
+        self.trace = trace
+        self.start = time.perf_counter()
+        self.recorded = False
+
+    def observe(self, event_name: str):
+        if not self.recorded and event_name.endswith(_CONNECTION_EVENTS):
+            self.recorded = True
+            self.metrics.record_wait(time.perf_counter() - self.start)
+
+    def __call__(self, event_name, info):
+        self.observe(event_name)
+        if self.trace is not None:
+            self.trace(event_name, info)
+
+class _AsyncWaitTimer(_WaitTimer):
+    async def __call__(self, event_name, info):
+        self.observe(event_name)
+        if self.trace is not None:
+            await self.trace(event_name, info)
+
+class RetryTransport(httpx.BaseTransport):
+    def __init__(self, metrics: PoolMetrics):
+        self.metrics = metrics
+        self._transport = httpx.HTTPTransport(http2=HTTP2, limits=pool_limits())
+        metrics.pool = self._transport._pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.metrics.started()
+        attempt = 0
+        while True:
+            request.extensions['trace'] = _WaitTimer(self.metrics, request.extensions.get('trace'))
+            try:
+                response = self._transport.handle_request(request)
+            except Exception as e:
+                if not should_retry(request, attempt, error=e):
+                    self.metrics.finished(error=True)
+                    raise
+                logger.warning(f"Supabase request failed ({e!r}), retrying")
+            else:
+                if not should_retry(request, attempt, response=response):
+                    self.metrics.finished()
+                    return response
+                response.close()
+            self.metrics.retried()
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+
+    def close(self):
+        self._transport.close()
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    def __init__(self, metrics: PoolMetrics):
+        self.metrics = metrics
+        self._transport = httpx.AsyncHTTPTransport(http2=HTTP2, limits=pool_limits())
+        metrics.pool = self._transport._pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.metrics.started()
+        attempt = 0
+        while True:
+            request.extensions['trace'] = _AsyncWaitTimer(self.metrics, request.extensions.get('trace'))
+            try:
+                response = await self._transport.handle_async_request(request)
+            except Exception as e:
+                if not should_retry(request, attempt, error=e):
+                    self.metrics.finished(error=True)
+                    raise
+                logger.warning(f"Supabase request failed ({e!r}), retrying")
+            else:
+                if not should_retry(request, attempt, response=response):
+                    self.metrics.finished()
+                    return response
+                await response.aclose()
+            self.metrics.retried()
+            await asyncio.sleep(retry_delay(attempt))
+            attempt += 1
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+sync_metrics = PoolMetrics('sync')
+async_metrics = PoolMetrics('async')
+
+def create_http_client() -> httpx.Client:
+    """httpx client for the synchronous Supabase client."""
+    return httpx.Client(transport=RetryTransport(sync_metrics), timeout=pool_timeout(),
+                        follow_redirects=True)
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """httpx client for the async Supabase client."""
+    return httpx.AsyncClient(transport=AsyncRetryTransport(async_metrics), timeout=pool_timeout(),
+                             follow_redirects=True)
+
+def pool_settings() -> dict:
+    return {
+        'max_connections': MAX_CONNECTIONS,
+        'max_keepalive': MAX_KEEPALIVE,
+        'keepalive_expiry': KEEPALIVE_EXPIRY,
+        'http2': HTTP2,
+        'connect_timeout': CONNECT_TIMEOUT,
+        'read_timeout': READ_TIMEOUT,
+        'pool_timeout': POOL_TIMEOUT,
+        'retries': RETRIES,
+        'retry_backoff': RETRY_BACKOFF
+    }
+
+def pool_metrics() -> dict:
+    """Settings and per-client metrics for this worker process."""
+    return {
+        'pid': os.getpid(),
+        'settings': pool_settings(),
+        'sync': sync_metrics.snapshot(),
+        'async': async_metrics.snapshot()
+    }
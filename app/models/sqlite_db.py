@@ -0,0 +1,583 @@
+"""
+Local SQLite engine for the Supabase schema.
+
+Mirrors the tables and RPC functions documented in supabase_db.init_db. Used
+by the SQLite storage backend (STORAGE_BACKEND=sqlite) and by the offline
+benchmarks.
+
+Every statement is a module-level constant run with bound parameters, so
+each connection's statement cache (cached_statements) keeps them prepared
+after first use.
+"""
+
+import sqlite3
+
+STATEMENT_CACHE_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registerno TEXT NOT NULL,
+    department TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(registerno, department, semester)
+);
+
+CREATE INDEX IF NOT EXISTS idx_students_regno ON students(registerno);
+CREATE INDEX IF NOT EXISTS idx_students_dept_sem ON students(department, semester);
+
+CREATE TABLE IF NOT EXISTS departments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS semesters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS staff (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS admin_mappings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    department TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    staff TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(department, semester, staff, subject)
+);
+
+CREATE TABLE IF NOT EXISTS ratings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registerno TEXT NOT NULL,
+    department TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    staff TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    q1 REAL NOT NULL,
+    q2 REAL NOT NULL,
+    q3 REAL NOT NULL,
+    q4 REAL NOT NULL,
+    q5 REAL NOT NULL,
+    q6 REAL NOT NULL,
+    q7 REAL NOT NULL,
+    q8 REAL NOT NULL,
+    q9 REAL NOT NULL,
+    q10 REAL NOT NULL,
+    average REAL NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ratings_regno ON ratings(registerno);
+CREATE INDEX IF NOT EXISTS idx_ratings_dept_sem_staff_subj ON ratings(department, semester, staff, subject);
+
+CREATE TABLE IF NOT EXISTS submitted_feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registerno TEXT NOT NULL UNIQUE,
+    submission_token TEXT,
+    submitted_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS rating_aggregates (
+    department TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    staff TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    response_count INTEGER NOT NULL DEFAULT 0,
+    q1_sum REAL NOT NULL DEFAULT 0,
+    q2_sum REAL NOT NULL DEFAULT 0,
+    q3_sum REAL NOT NULL DEFAULT 0,
+    q4_sum REAL NOT NULL DEFAULT 0,
+    q5_sum REAL NOT NULL DEFAULT 0,
+    q6_sum REAL NOT NULL DEFAULT 0,
+    q7_sum REAL NOT NULL DEFAULT 0,
+    q8_sum REAL NOT NULL DEFAULT 0,
+    q9_sum REAL NOT NULL DEFAULT 0,
+    q10_sum REAL NOT NULL DEFAULT 0,
+    q1_sq_sum REAL NOT NULL DEFAULT 0,
+    q2_sq_sum REAL NOT NULL DEFAULT 0,
+    q3_sq_sum REAL NOT NULL DEFAULT 0,
+    q4_sq_sum REAL NOT NULL DEFAULT 0,
+    q5_sq_sum REAL NOT NULL DEFAULT 0,
+    q6_sq_sum REAL NOT NULL DEFAULT 0,
+    q7_sq_sum REAL NOT NULL DEFAULT 0,
+    q8_sq_sum REAL NOT NULL DEFAULT 0,
+    q9_sq_sum REAL NOT NULL DEFAULT 0,
+    q10_sq_sum REAL NOT NULL DEFAULT 0,
+    average_sum REAL NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (department, semester, staff, subject)
+);
+
+CREATE TABLE IF NOT EXISTS student_batch_ranges (
+    department TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    min_regno INTEGER,
+    max_regno INTEGER,
+    student_count INTEGER NOT NULL DEFAULT 0,
+    submitted_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (department, semester)
+);
+"""
+
+# Same shape as the refresh_batch_range() Postgres function
+REFRESH_BATCH_RANGE_SQL = """
+INSERT INTO student_batch_ranges (department, semester, min_regno, max_regno,
+                                  student_count, submitted_count, updated_at)
+SELECT :department, :semester,
+       MIN(CASE WHEN s.registerno NOT GLOB '*[^0-9]*' THEN CAST(s.registerno AS INTEGER) END),
+       MAX(CASE WHEN s.registerno NOT GLOB '*[^0-9]*' THEN CAST(s.registerno AS INTEGER) END),
+       COUNT(*),
+       COALESCE(SUM(EXISTS (SELECT 1 FROM submitted_feedback f WHERE f.registerno = s.registerno)), 0),
+       CURRENT_TIMESTAMP
+FROM students s
+WHERE s.department = :department AND s.semester = :semester
+ON CONFLICT (department, semester) DO UPDATE SET
+    min_regno = excluded.min_regno,
+    max_regno = excluded.max_regno,
+    student_count = excluded.student_count,
+    submitted_count = excluded.submitted_count,
+    updated_at = excluded.updated_at
+"""
+
+# Live progress counter, bumped by submit_feedback()
+INCREMENT_SUBMITTED_SQL = """
+UPDATE student_batch_ranges
+SET submitted_count = submitted_count + 1, updated_at = CURRENT_TIMESTAMP
+WHERE (department, semester) IN (
+    SELECT department, semester FROM students WHERE registerno = ?
+)
+"""
+
+# Same shape as the login_lookup() Postgres function
+LOGIN_LOOKUP_SQL = """
+SELECT s.registerno, s.department, s.semester,
+       EXISTS (SELECT 1 FROM submitted_feedback f WHERE f.registerno = :registerno) AS submitted,
+       r.min_regno, r.max_regno
+FROM students s
+LEFT JOIN student_batch_ranges r
+    ON r.department = s.department AND r.semester = s.semester
+WHERE s.registerno = :registerno
+LIMIT 1
+"""
+
+# Same shape as the class_rating_summary() Postgres function; {semesters} is
+# expanded to one placeholder per semester variation
+CLASS_RATING_SUMMARY_SQL = """
+SELECT staff, subject,
+       SUM(q1_sum) / SUM(response_count) AS q1_avg,
+       SUM(q2_sum) / SUM(response_count) AS q2_avg,
+       SUM(q3_sum) / SUM(response_count) AS q3_avg,
+       SUM(q4_sum) / SUM(response_count) AS q4_avg,
+       SUM(q5_sum) / SUM(response_count) AS q5_avg,
+       SUM(q6_sum) / SUM(response_count) AS q6_avg,
+       SUM(q7_sum) / SUM(response_count) AS q7_avg,
+       SUM(q8_sum) / SUM(response_count) AS q8_avg,
+       SUM(q9_sum) / SUM(response_count) AS q9_avg,
+       SUM(q10_sum) / SUM(response_count) AS q10_avg,
+       SUM(response_count) AS response_count
+FROM rating_aggregates
+WHERE department = ? AND semester IN ({semesters})
+GROUP BY staff, subject
+HAVING SUM(response_count) > 0
+ORDER BY staff, subject
+"""
+
+# Same rows as the class_non_submissions() Postgres function before
+# aggregation; {semesters} is expanded as in CLASS_RATING_SUMMARY_SQL
+CLASS_SUBMISSION_COUNT_SQL = """
+SELECT COUNT(*) FROM students
+WHERE department = ? AND semester IN ({semesters})
+"""
+
+CLASS_NON_SUBMISSIONS_SQL = """
+SELECT s.registerno, s.department, s.semester
+FROM students s
+WHERE s.department = ? AND s.semester IN ({semesters})
+  AND NOT EXISTS (SELECT 1 FROM submitted_feedback f WHERE f.registerno = s.registerno)
+ORDER BY s.registerno
+"""
+
+# Adds one rating row to its running totals
+ACCUMULATE_RATING_SQL = """
+INSERT INTO rating_aggregates (department, semester, staff, subject, response_count,
+    q1_sum, q2_sum, q3_sum, q4_sum, q5_sum, q6_sum, q7_sum, q8_sum, q9_sum, q10_sum,
+    q1_sq_sum, q2_sq_sum, q3_sq_sum, q4_sq_sum, q5_sq_sum, q6_sq_sum, q7_sq_sum, q8_sq_sum, q9_sq_sum, q10_sq_sum,
+    average_sum)
+VALUES (:department, :semester, :staff, :subject, 1,
+    :q1, :q2, :q3, :q4, :q5, :q6, :q7, :q8, :q9, :q10,
+    :q1 * :q1, :q2 * :q2, :q3 * :q3, :q4 * :q4, :q5 * :q5,
+    :q6 * :q6, :q7 * :q7, :q8 * :q8, :q9 * :q9, :q10 * :q10,
+    :average)
+ON CONFLICT (department, semester, staff, subject) DO UPDATE SET
+    response_count = response_count + 1,
+    q1_sum = q1_sum + excluded.q1_sum,
+    q2_sum = q2_sum + excluded.q2_sum,
+    q3_sum = q3_sum + excluded.q3_sum,
+    q4_sum = q4_sum + excluded.q4_sum,
+    q5_sum = q5_sum + excluded.q5_sum,
+    q6_sum = q6_sum + excluded.q6_sum,
+    q7_sum = q7_sum + excluded.q7_sum,
+    q8_sum = q8_sum + excluded.q8_sum,
+    q9_sum = q9_sum + excluded.q9_sum,
+    q10_sum = q10_sum + excluded.q10_sum,
+    q1_sq_sum = q1_sq_sum + excluded.q1_sq_sum,
+    q2_sq_sum = q2_sq_sum + excluded.q2_sq_sum,
+    q3_sq_sum = q3_sq_sum + excluded.q3_sq_sum,
+    q4_sq_sum = q4_sq_sum + excluded.q4_sq_sum,
+    q5_sq_sum = q5_sq_sum + excluded.q5_sq_sum,
+    q6_sq_sum = q6_sq_sum + excluded.q6_sq_sum,
+    q7_sq_sum = q7_sq_sum + excluded.q7_sq_sum,
+    q8_sq_sum = q8_sq_sum + excluded.q8_sq_sum,
+    q9_sq_sum = q9_sq_sum + excluded.q9_sq_sum,
+    q10_sq_sum = q10_sq_sum + excluded.q10_sq_sum,
+    average_sum = average_sum + excluded.average_sum,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+# Same shape as the rebuild_rating_aggregates() Postgres function
+REBUILD_RATING_AGGREGATES_SQL = """
+INSERT INTO rating_aggregates (department, semester, staff, subject, response_count,
+    q1_sum, q2_sum, q3_sum, q4_sum, q5_sum, q6_sum, q7_sum, q8_sum, q9_sum, q10_sum,
+    q1_sq_sum, q2_sq_sum, q3_sq_sum, q4_sq_sum, q5_sq_sum, q6_sq_sum, q7_sq_sum, q8_sq_sum, q9_sq_sum, q10_sq_sum,
+    average_sum)
+SELECT department, semester, staff, subject, COUNT(*),
+       SUM(q1), SUM(q2), SUM(q3), SUM(q4), SUM(q5),
+       SUM(q6), SUM(q7), SUM(q8), SUM(q9), SUM(q10),
+       SUM(q1 * q1), SUM(q2 * q2), SUM(q3 * q3), SUM(q4 * q4), SUM(q5 * q5),
+       SUM(q6 * q6), SUM(q7 * q7), SUM(q8 * q8), SUM(q9 * q9), SUM(q10 * q10),
+       SUM(average)
+FROM ratings
+GROUP BY department, semester, staff, subject
+"""
+
+RATING_COLUMNS = ['registerno', 'department', 'semester', 'staff', 'subject',
+                  'q1', 'q2', 'q3', 'q4', 'q5', 'q6', 'q7', 'q8', 'q9', 'q10', 'average']
+
+SUBMITTED_SQL = "SELECT 1 FROM submitted_feedback WHERE registerno = ? LIMIT 1"
+
+SUBMISSIONS_SQL = """
+SELECT registerno, submitted_at FROM submitted_feedback
+ORDER BY submitted_at
+"""
+
+SUBMISSIONS_SINCE_SQL = """
+SELECT registerno, submitted_at FROM submitted_feedback
+WHERE submitted_at >= ?
+ORDER BY submitted_at
+"""
+
+# {semesters} is expanded as in CLASS_RATING_SUMMARY_SQL
+LOAD_MAPPINGS_SQL = """
+SELECT department, semester, staff, subject FROM admin_mappings
+WHERE department = ? AND semester IN ({semesters})
+ORDER BY id
+"""
+
+# {where} is empty or a WHERE clause built by rating_aggregates()
+RATING_AGGREGATES_SQL = """
+SELECT * FROM rating_aggregates
+{where}
+ORDER BY department, semester, staff, subject
+"""
+
+BATCH_RANGES_SQL = """
+SELECT department, semester, min_regno, max_regno, student_count, submitted_count
+FROM student_batch_ranges
+ORDER BY department, semester
+"""
+
+REFERENCE_NAMES_SQL = "SELECT name FROM {table} ORDER BY name"
+
+# {where} is empty or a WHERE clause built by find_students()
+FIND_STUDENTS_SQL = """
+SELECT id, registerno, department, semester FROM students
+{where}
+ORDER BY department, semester, registerno
+"""
+
+INSERT_STUDENT_SQL = """
+INSERT INTO students (registerno, department, semester) VALUES (?, ?, ?)
+ON CONFLICT (registerno, department, semester) DO NOTHING
+"""
+
+# {where} is empty or a WHERE clause built by find_mappings()
+FIND_MAPPINGS_SQL = """
+SELECT id, department, semester, staff, subject FROM admin_mappings
+{where}
+ORDER BY department, semester, staff, subject
+"""
+
+INSERT_MAPPING_SQL = """
+INSERT INTO admin_mappings (department, semester, staff, subject)
+VALUES (:department, :semester, :staff, :subject)
+ON CONFLICT (department, semester, staff, subject) DO NOTHING
+"""
+
+REFERENCE_TABLES = ('departments', 'semesters', 'staff', 'subjects')
+
+# Tables emptied when a feedback cycle is archived, in delete order
+CYCLE_TABLES = ('ratings', 'rating_aggregates', 'submitted_feedback',
+                'admin_mappings', 'students', 'student_batch_ranges')
+
+def connect(path=':memory:'):
+    """Open a SQLite database with the feedback schema applied.
+    File databases use WAL so readers never wait on the single writer.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    if path != ':memory:':
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(SCHEMA)
+    return conn
+
+def refresh_batch_range(conn, department, semester):
+    """Local equivalent of Student.refresh_batch_range."""
+    # Rolls back on error so a failed refresh never keeps the write lock
+    with conn:
+        conn.execute(REFRESH_BATCH_RANGE_SQL, {'department': department, 'semester': semester})
+
+def login_lookup(conn, registerno):
+    """Local equivalent of Student.login_lookup."""
+    row = conn.execute(LOGIN_LOOKUP_SQL, {'registerno': registerno}).fetchone()
+    if row is None:
+        return None
+    return {
+        'registerno': row['registerno'],
+        'department': row['department'],
+        'semester': row['semester'],
+        'submitted': bool(row['submitted']),
+        'min_regno': row['min_regno'],
+        'max_regno': row['max_regno']
+    }
+
+def submit_feedback(conn, registerno, token, ratings):
+    """Local equivalent of the submit_feedback() Postgres function.
+    Returns: (status, rating_count) where status is 'created', 'replayed' or 'duplicate'
+    """
+    placeholders = ', '.join(f':{col}' for col in RATING_COLUMNS)
+    with conn:
+        claimed = conn.execute(
+            "INSERT INTO submitted_feedback (registerno, submission_token) VALUES (?, ?) "
+            "ON CONFLICT (registerno) DO NOTHING",
+            (registerno, token)
+        ).rowcount
+        if not claimed:
+            existing = conn.execute(
+                "SELECT submission_token FROM submitted_feedback WHERE registerno = ?",
+                (registerno,)
+            ).fetchone()
+            count = conn.execute(
+                "SELECT COUNT(*) FROM ratings WHERE registerno = ?", (registerno,)
+            ).fetchone()[0]
+            status = 'replayed' if token is not None and existing[0] == token else 'duplicate'
+            return status, count
+
+        conn.execute(INCREMENT_SUBMITTED_SQL, (registerno,))
+        conn.executemany(
+            f"INSERT INTO ratings ({', '.join(RATING_COLUMNS)}) VALUES ({placeholders})",
+            ratings
+        )
+        conn.executemany(ACCUMULATE_RATING_SQL, ratings)
+    return 'created', len(ratings)
+
+def rebuild_rating_aggregates(conn):
+    """Local equivalent of the rebuild_rating_aggregates() Postgres function."""
+    with conn:
+        conn.execute("DELETE FROM rating_aggregates")
+        rebuilt = conn.execute(REBUILD_RATING_AGGREGATES_SQL).rowcount
+    return rebuilt
+
+def class_rating_summary(conn, department, semesters):
+    """Local equivalent of the class_rating_summary() Postgres function."""
+    sql = CLASS_RATING_SUMMARY_SQL.format(semesters=', '.join('?' for _ in semesters))
+    return [dict(row) for row in conn.execute(sql, [department, *semesters]).fetchall()]
+
+def class_non_submissions(conn, department, semesters):
+    """Local equivalent of the class_non_submissions() Postgres function."""
+    placeholders = ', '.join('?' for _ in semesters)
+    params = [department, *semesters]
+    total = conn.execute(CLASS_SUBMISSION_COUNT_SQL.format(semesters=placeholders), params).fetchone()[0]
+    pending = [dict(row) for row in
+               conn.execute(CLASS_NON_SUBMISSIONS_SQL.format(semesters=placeholders), params).fetchall()]
+    return {
+        'total_students': total,
+        'submitted_count': total - len(pending),
+        'non_submitted': pending
+    }
+
+def has_submitted(conn, registerno):
+    return conn.execute(SUBMITTED_SQL, (registerno,)).fetchone() is not None
+
+def fetch_submissions(conn, since=None):
+    """submitted_feedback rows ordered by submitted_at, optionally from `since` on."""
+    if since:
+        rows = conn.execute(SUBMISSIONS_SINCE_SQL, (since,)).fetchall()
+    else:
+        rows = conn.execute(SUBMISSIONS_SQL).fetchall()
+    return [dict(row) for row in rows]
+
+def load_mappings(conn, department, semesters):
+    sql = LOAD_MAPPINGS_SQL.format(semesters=', '.join('?' for _ in semesters))
+    return [dict(row) for row in conn.execute(sql, [department, *semesters]).fetchall()]
+
+def rating_aggregates(conn, department=None, semesters=None):
+    clauses, params = [], []
+    if department:
+        clauses.append("department = ?")
+        params.append(department)
+    if semesters:
+        clauses.append(f"semester IN ({', '.join('?' for _ in semesters)})")
+        params.extend(semesters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    sql = RATING_AGGREGATES_SQL.format(where=where)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+def batch_ranges(conn):
+    return [dict(row) for row in conn.execute(BATCH_RANGES_SQL).fetchall()]
+
+def _check_reference_table(table):
+    # Table names cannot be bound as parameters
+    if table not in REFERENCE_TABLES:
+        raise ValueError(f"Unknown reference table: {table}")
+
+def reference_names(conn, table):
+    _check_reference_table(table)
+    return [row[0] for row in conn.execute(REFERENCE_NAMES_SQL.format(table=table)).fetchall()]
+
+def existing_reference_names(conn, table, names):
+    """The subset of `names` already in a reference table."""
+    _check_reference_table(table)
+    if not names:
+        return set()
+    sql = f"SELECT name FROM {table} WHERE name IN ({', '.join('?' for _ in names)})"
+    return {row[0] for row in conn.execute(sql, list(names)).fetchall()}
+
+def insert_reference_names(conn, table, names):
+    """Insert names, skipping ones that exist. Returns the number inserted."""
+    _check_reference_table(table)
+    with conn:
+        return conn.executemany(
+            f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT (name) DO NOTHING",
+            [(name,) for name in names]
+        ).rowcount
+
+def _in_clause(column, values, clauses, params):
+    clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+    params.extend(values)
+
+def find_students(conn, registerno=None, departments=None, semesters=None):
+    clauses, params = [], []
+    if registerno:
+        clauses.append("registerno = ?")
+        params.append(registerno)
+    if departments:
+        _in_clause('department', departments, clauses, params)
+    if semesters:
+        _in_clause('semester', semesters, clauses, params)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return [dict(row) for row in conn.execute(FIND_STUDENTS_SQL.format(where=where), params).fetchall()]
+
+def student_values(conn, column):
+    """Distinct values of the department or semester column."""
+    if column not in ('department', 'semester'):
+        raise ValueError(f"Unknown student column: {column}")
+    return [row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM students").fetchall()]
+
+def insert_students(conn, students):
+    """Insert (registerno, department, semester) tuples, skipping existing ones.
+    Returns: the inserted rows
+    """
+    inserted = []
+    with conn:
+        for registerno, department, semester in students:
+            cursor = conn.execute(INSERT_STUDENT_SQL, (registerno, department, semester))
+            if cursor.rowcount:
+                inserted.append({'id': cursor.lastrowid, 'registerno': registerno,
+                                 'department': department, 'semester': semester})
+    return inserted
+
+def delete_student(conn, registerno, department, semester):
+    with conn:
+        return conn.execute(
+            "DELETE FROM students WHERE registerno = ? AND department = ? AND semester = ?",
+            (registerno, department, semester)
+        ).rowcount > 0
+
+def count_students(conn):
+    return conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+def find_mappings(conn, department=None, semester=None, limit=None):
+    clauses, params = [], []
+    if department:
+        clauses.append("department = ?")
+        params.append(department)
+    if semester:
+        clauses.append("semester = ?")
+        params.append(semester)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    sql = FIND_MAPPINGS_SQL.format(where=where)
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+def insert_mappings(conn, mappings):
+    """Insert mapping dicts, skipping existing ones. Returns the number inserted."""
+    with conn:
+        return conn.executemany(INSERT_MAPPING_SQL, mappings).rowcount
+
+def delete_mappings(conn, department, semester):
+    with conn:
+        return conn.execute(
+            "DELETE FROM admin_mappings WHERE department = ? AND semester = ?",
+            (department, semester)
+        ).rowcount
+
+def mapping_version(conn):
+    count, max_id = conn.execute("SELECT COUNT(*), MAX(id) FROM admin_mappings").fetchone()
+    return count, max_id
+
+def delete_mapping(conn, mapping_id):
+    """Delete one mapping. Returns the deleted row, or None if there was none."""
+    with conn:
+        row = conn.execute(
+            "SELECT id, department, semester, staff, subject FROM admin_mappings WHERE id = ?",
+            (mapping_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM admin_mappings WHERE id = ?", (mapping_id,))
+    return dict(row)
+
+def clear_cycle_data(conn):
+    """Empty the per-cycle tables. Returns {table: deleted_rows}."""
+    deleted = {}
+    with conn:
+        for table in CYCLE_TABLES:
+            deleted[table] = conn.execute(f"DELETE FROM {table}").rowcount
+    return deleted
+
+def backup(conn, dest_path):
+    """Consistent copy of the live database (safe while WAL writers are active)."""
+    dest = sqlite3.connect(dest_path)
+    try:
+        conn.backup(dest)
+    finally:
+        dest.close()
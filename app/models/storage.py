@@ -0,0 +1,495 @@
+"""
+Storage backends for the operations the feedback flow and reports perform.
+
+STORAGE_BACKEND selects the engine:
+
+    supabase  the hosted Postgres database through the Supabase REST client
+              (the RPC functions documented in supabase_db.init_db)
+    sqlite    a local database file at DATABASE_PATH (WAL mode), for
+              offline benchmarking and campus-LAN deployments
+
+Both implement StorageBackend, which also covers the admin CRUD screens
+(reference lists, students and staff/subject mappings), so every page works
+on either engine.
+"""
+
+import os
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Set, Tuple
+from .database import get_db, fetch_all
+from . import sqlite_db
+import config
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+AGGREGATE_COLUMNS = ', '.join(
+    ['department', 'semester', 'staff', 'subject', 'response_count']
+    + [f'q{i}_sum' for i in range(1, 11)]
+    + [f'q{i}_sq_sum' for i in range(1, 11)]
+    + ['average_sum']
+)
+
+class StorageBackend(ABC):
+    """Database operations the app performs, independent of the engine."""
+
+    name = None
+
+    @abstractmethod
+    def ping(self):
+        """Cheap round trip that raises if the database is unreachable."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def login_lookup(self, registerno: str) -> Optional[dict]:
+        """Student info, submission flag and batch range, or None if unknown."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def has_submitted(self, registerno: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_submissions(self, since: str = None) -> List[dict]:
+        """registerno/submitted_at rows ordered by submitted_at."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_mappings(self, department: str, semesters: List[str]) -> List[dict]:
+        """Staff/subject mappings for a class (any of the semester spellings)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def submit_feedback(self, registerno: str, token: Optional[str], ratings: List[dict]) -> str:
+        """Store a submission atomically. Returns 'created', 'replayed' or 'duplicate'."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def refresh_batch_range(self, department: str, semester: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def class_rating_summary(self, department: str, semesters: List[str]) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def class_non_submissions(self, department: str, semesters: List[str]) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def rating_aggregates(self, department: str = None, semesters: List[str] = None) -> List[dict]:
+        """rating_aggregates rows, optionally limited to a department and/or semester spellings."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def rebuild_rating_aggregates(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def batch_ranges(self) -> List[dict]:
+        """Every student_batch_ranges row."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_cycle_data(self) -> Dict[str, int]:
+        """Empty the per-cycle tables when archiving. Returns {table: deleted_rows}."""
+        raise NotImplementedError
+
+    def backup(self, dest_path: str) -> bool:
+        """Write a copy of the database to dest_path. False if the engine has no local copy."""
+        return False
+
+    @abstractmethod
+    def reference_names(self, table: str) -> List[str]:
+        """Ordered names in a reference table (departments, semesters, staff, subjects)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def existing_reference_names(self, table: str, names: List[str]) -> Set[str]:
+        """The subset of `names` already in a reference table."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_reference_names(self, table: str, names: List[str]) -> int:
+        """Insert names, skipping existing ones. Returns the number inserted."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_students(self, registerno: str = None, departments: List[str] = None,
+                      semesters: List[str] = None) -> List[dict]:
+        """id/registerno/department/semester rows matching every given filter."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def student_values(self, column: str) -> List[str]:
+        """Distinct values of the students 'department' or 'semester' column."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_students(self, students: List[Tuple[str, str, str]]) -> List[dict]:
+        """Insert (registerno, department, semester) rows, skipping existing ones. Returns the inserted rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_student(self, registerno: str, department: str, semester: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_students(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_mappings(self, department: str = None, semester: str = None,
+                      limit: int = None) -> List[dict]:
+        """id/department/semester/staff/subject rows, optionally limited to a department and/or semester."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_mappings(self, mappings: List[dict]) -> int:
+        """Insert mapping rows, skipping existing ones. Returns the number inserted."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_mappings(self, department: str, semester: str) -> int:
+        """Delete a class's mappings. Returns the number deleted."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_mapping(self, mapping_id) -> Optional[dict]:
+        """Delete one mapping. Returns the deleted row, or None if there was none."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def mapping_version(self) -> Tuple[int, Optional[int]]:
+        """(row count, highest id) of admin_mappings; changes with every insert or delete."""
+        raise NotImplementedError
+
+class SupabaseStorage(StorageBackend):
+    name = 'supabase'
+
+    def ping(self):
+        get_db().table('student_batch_ranges').select('department').limit(1).execute()
+
+    def login_lookup(self, registerno):
+        result = get_db().rpc('login_lookup', {'p_registerno': registerno}).execute()
+        return result.data[0] if result.data else None
+
+    def has_submitted(self, registerno):
+        result = get_db().table('submitted_feedback')\
+            .select('id')\
+            .eq('registerno', registerno)\
+            .limit(1)\
+            .execute()
+        return bool(result.data)
+
+    def fetch_submissions(self, since=None):
+        client = get_db()
+
+        def build_query():
+            query = client.table('submitted_feedback').select('registerno, submitted_at')
+            if since:
+                query = query.gte('submitted_at', since)
+            return query.order('submitted_at')
+
+        return fetch_all(build_query, PAGE_SIZE)
+
+    def load_mappings(self, department, semesters):
+        result = get_db().table('admin_mappings')\
+            .select('department, semester, staff, subject')\
+            .eq('department', department)\
+            .in_('semester', semesters)\
+            .execute()
+        return result.data
+
+    def submit_feedback(self, registerno, token, ratings):
+        result = get_db().rpc('submit_feedback', {
+            'p_registerno': registerno,
+            'p_token': token,
+            'p_ratings': ratings
+        }).execute()
+        return result.data[0]['status']
+
+    def refresh_batch_range(self, department, semester):
+        get_db().rpc('refresh_batch_range', {
+            'p_department': department,
+            'p_semester': semester
+        }).execute()
+
+    def class_rating_summary(self, department, semesters):
+        result = get_db().rpc('class_rating_summary', {
+            'p_department': department,
+            'p_semesters': semesters
+        }).execute()
+        return result.data
+
+    def class_non_submissions(self, department, semesters):
+        result = get_db().rpc('class_non_submissions', {
+            'p_department': department,
+            'p_semesters': semesters
+        }).execute()
+        return result.data[0] if result.data else {}
+
+    def rating_aggregates(self, department=None, semesters=None):
+        client = get_db()
+
+        def build_query():
+            query = client.table('rating_aggregates').select(AGGREGATE_COLUMNS)
+            if department:
+                query = query.eq('department', department)
+            if semesters:
+                query = query.in_('semester', semesters)
+            return query.order('department').order('semester').order('staff').order('subject')
+
+        return fetch_all(build_query, PAGE_SIZE)
+
+    def rebuild_rating_aggregates(self):
+        result = get_db().rpc('rebuild_rating_aggregates', {}).execute()
+        return result.data or 0
+
+    def batch_ranges(self):
+        result = get_db().table('student_batch_ranges')\
+            .select('department, semester, min_regno, max_regno, student_count, submitted_count')\
+            .execute()
+        return result.data
+
+    def clear_cycle_data(self):
+        client = get_db()
+        # PostgREST refuses unfiltered deletes, so each delete carries an always-true filter
+        filters = {
+            'ratings': ('neq', 'id', 0),
+            'rating_aggregates': ('gte', 'response_count', 0),
+            'submitted_feedback': ('neq', 'id', 0),
+            'admin_mappings': ('neq', 'id', 0),
+            'students': ('neq', 'id', 0),
+            'student_batch_ranges': ('gte', 'student_count', 0),
+        }
+        deleted = {}
+        for table in sqlite_db.CYCLE_TABLES:
+            method, column, value = filters[table]
+            result = getattr(client.table(table).delete(), method)(column, value).execute()
+            deleted[table] = len(result.data) if result.data else 0
+        return deleted
+
+    def reference_names(self, table):
+        result = get_db().table(table).select('name').order('name').execute()
+        return [row['name'] for row in result.data]
+
+    def existing_reference_names(self, table, names):
+        if not names:
+            return set()
+        result = get_db().table(table).select('name').in_('name', list(names)).execute()
+        return {row['name'] for row in result.data}
+
+    def insert_reference_names(self, table, names):
+        result = get_db().table(table).upsert(
+            [{'name': name} for name in names],
+            on_conflict='name',
+            ignore_duplicates=True
+        ).execute()
+        return len(result.data)
+
+    def find_students(self, registerno=None, departments=None, semesters=None):
+        client = get_db()
+
+        def build_query():
+            query = client.table('students').select('id, registerno, department, semester')
+            if registerno:
+                query = query.eq('registerno', registerno)
+            if departments:
+                query = query.in_('department', departments)
+            if semesters:
+                query = query.in_('semester', semesters)
+            return query.order('department').order('semester').order('registerno')
+
+        return fetch_all(build_query, PAGE_SIZE)
+
+    def student_values(self, column):
+        client = get_db()
+        rows = fetch_all(lambda: client.table('students').select(column).order(column), PAGE_SIZE)
+        return list(dict.fromkeys(row[column] for row in rows))
+
+    def insert_students(self, students):
+        # Rows added concurrently by someone else are skipped by the UNIQUE constraint
+        result = get_db().table('students').upsert(
+            [{'registerno': r, 'department': d, 'semester': s} for r, d, s in students],
+            on_conflict='registerno,department,semester',
+            ignore_duplicates=True
+        ).execute()
+        return result.data
+
+    def delete_student(self, registerno, department, semester):
+        result = get_db().table('students')\
+            .delete()\
+            .eq('registerno', registerno)\
+            .eq('department', department)\
+            .eq('semester', semester)\
+            .execute()
+        return bool(result.data)
+
+    def count_students(self):
+        result = get_db().table('students').select('id', count='exact').limit(1).execute()
+        return result.count or 0
+
+    def find_mappings(self, department=None, semester=None, limit=None):
+        query = get_db().table('admin_mappings').select('id, department, semester, staff, subject')
+        if department:
+            query = query.eq('department', department)
+        if semester:
+            query = query.eq('semester', semester)
+        query = query.order('department').order('semester').order('staff').order('subject')
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def insert_mappings(self, mappings):
+        result = get_db().table('admin_mappings').upsert(
+            mappings,
+            on_conflict='department,semester,staff,subject',
+            ignore_duplicates=True
+        ).execute()
+        return len(result.data)
+
+    def delete_mappings(self, department, semester):
+        result = get_db().table('admin_mappings')\
+            .delete()\
+            .eq('department', department)\
+            .eq('semester', semester)\
+            .execute()
+        return len(result.data) if result.data else 0
+
+    def delete_mapping(self, mapping_id):
+        result = get_db().table('admin_mappings').delete().eq('id', mapping_id).execute()
+        return result.data[0] if result.data else None
+
+    def mapping_version(self):
+        result = get_db().table('admin_mappings')\
+            .select('id', count='exact')\
+            .order('id', desc=True)\
+            .limit(1)\
+            .execute()
+        return result.count or 0, result.data[0]['id'] if result.data else None
+
+class SQLiteStorage(StorageBackend):
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def conn(self):
+        # One connection per thread; WAL lets them read while another writes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_db.connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def ping(self):
+        self.conn.execute("SELECT 1").fetchone()
+
+    def login_lookup(self, registerno):
+        return sqlite_db.login_lookup(self.conn, registerno)
+
+    def has_submitted(self, registerno):
+        return sqlite_db.has_submitted(self.conn, registerno)
+
+    def fetch_submissions(self, since=None):
+        return sqlite_db.fetch_submissions(self.conn, since)
+
+    def load_mappings(self, department, semesters):
+        return sqlite_db.load_mappings(self.conn, department, semesters)
+
+    def submit_feedback(self, registerno, token, ratings):
+        status, _ = sqlite_db.submit_feedback(self.conn, registerno, token, ratings)
+        return status
+
+    def refresh_batch_range(self, department, semester):
+        sqlite_db.refresh_batch_range(self.conn, department, semester)
+
+    def class_rating_summary(self, department, semesters):
+        return sqlite_db.class_rating_summary(self.conn, department, semesters)
+
+    def class_non_submissions(self, department, semesters):
+        return sqlite_db.class_non_submissions(self.conn, department, semesters)
+
+    def rating_aggregates(self, department=None, semesters=None):
+        return sqlite_db.rating_aggregates(self.conn, department, semesters)
+
+    def rebuild_rating_aggregates(self):
+        return sqlite_db.rebuild_rating_aggregates(self.conn)
+
+    def batch_ranges(self):
+        return sqlite_db.batch_ranges(self.conn)
+
+    def clear_cycle_data(self):
+        return sqlite_db.clear_cycle_data(self.conn)
+
+    def backup(self, dest_path):
+        sqlite_db.backup(self.conn, dest_path)
+        return True
+
+    def reference_names(self, table):
+        return sqlite_db.reference_names(self.conn, table)
+
+    def existing_reference_names(self, table, names):
+        return sqlite_db.existing_reference_names(self.conn, table, names)
+
+    def insert_reference_names(self, table, names):
+        return sqlite_db.insert_reference_names(self.conn, table, names)
+
+    def find_students(self, registerno=None, departments=None, semesters=None):
+        return sqlite_db.find_students(self.conn, registerno, departments, semesters)
+
+    def student_values(self, column):
+        return sqlite_db.student_values(self.conn, column)
+
+    def insert_students(self, students):
+        return sqlite_db.insert_students(self.conn, students)
+
+    def delete_student(self, registerno, department, semester):
+        return sqlite_db.delete_student(self.conn, registerno, department, semester)
+
+    def count_students(self):
+        return sqlite_db.count_students(self.conn)
+
+    def find_mappings(self, department=None, semester=None, limit=None):
+        return sqlite_db.find_mappings(self.conn, department, semester, limit)
+
+    def insert_mappings(self, mappings):
+        return sqlite_db.insert_mappings(self.conn, mappings)
+
+    def delete_mappings(self, department, semester):
+        return sqlite_db.delete_mappings(self.conn, department, semester)
+
+    def delete_mapping(self, mapping_id):
+        return sqlite_db.delete_mapping(self.conn, mapping_id)
+
+    def mapping_version(self):
+        return sqlite_db.mapping_version(self.conn)
+
+_storage: StorageBackend = None
+_storage_lock = threading.Lock()
+
+def create_storage(backend: str = None) -> StorageBackend:
+    backend = (backend or config.STORAGE_BACKEND).lower()
+    if backend == 'supabase':
+        return SupabaseStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(config.DATABASE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+def get_storage() -> StorageBackend:
+    """The process-wide storage backend selected by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+                logger.info(f"Using {_storage.name} storage backend")
+    return _storage
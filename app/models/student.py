@@ -1,21 +1,20 @@
 import logging
-from .database import get_db
+from .storage import get_storage
 from utils import normalize_regno, encrypt_regno, is_encrypted
 
 logger = logging.getLogger(__name__)
 
+# Rows per multi-row insert request
+INSERT_CHUNK_SIZE = 500
+
 class Student:
     @staticmethod
     def add(registerno, department, semester):
         """Add a new student to the database."""
-        client = get_db()
         try:
-            result = client.table('students').insert({
-                'registerno': registerno,
-                'department': department,
-                'semester': semester
-            }).execute()
-            return result.data[0]['id'] if result.data else None
+            inserted = get_storage().insert_students([(registerno, department, semester)])
+            Student.refresh_batch_range(department, semester)
+            return inserted[0]['id'] if inserted else None
         except Exception as e:
             logger.error(f"Error adding student: {e}")
             raise
@@ -25,66 +24,94 @@ class Student:
         """Add multiple students at once.
         students: list of tuples (registerno, department, semester)
         Returns: (added_count, duplicate_count, duplicates_list)
+        
+        Existing keys are prefetched in one (paged) query and new rows are
+        inserted in chunks, so cost grows with the number of requests rather
+        than the number of students.
         """
-        client = get_db()
+        storage = get_storage()
         added = []
         duplicates = []
+        added_groups = set()
+        
+        # Drop repeats within the batch itself
+        unique_students = list(dict.fromkeys(students))
+        if len(unique_students) < len(students):
+            seen = set()
+            for student in students:
+                if student in seen:
+                    duplicates.append(student[0])
+                seen.add(student)
         
-        for registerno, department, semester in students:
+        departments = sorted({department for _, department, _ in unique_students})
+        semesters = sorted({semester for _, _, semester in unique_students})
+        
+        try:
+            existing_rows = storage.find_students(departments=departments, semesters=semesters)
+            existing = {(row['registerno'], row['department'], row['semester'])
+                        for row in existing_rows}
+        except Exception as e:
+            logger.error(f"Error fetching existing students: {e}")
+            existing = set()
+        
+        new_students = []
+        for student in unique_students:
+            if student in existing:
+                duplicates.append(student[0])
+            else:
+                new_students.append(student)
+        
+        for start in range(0, len(new_students), INSERT_CHUNK_SIZE):
+            chunk = new_students[start:start + INSERT_CHUNK_SIZE]
             try:
-                # Check if student already exists
-                existing = client.table('students')\
-                    .select('registerno')\
-                    .eq('registerno', registerno)\
-                    .eq('department', department)\
-                    .eq('semester', semester)\
-                    .execute()
-                
-                if existing.data:
-                    duplicates.append(registerno)
-                else:
-                    client.table('students').insert({
-                        'registerno': registerno,
-                        'department': department,
-                        'semester': semester
-                    }).execute()
-                    added.append(registerno)
+                inserted = {(row['registerno'], row['department'], row['semester'])
+                            for row in storage.insert_students(chunk)}
             except Exception as e:
-                logger.error(f"Error adding student {registerno}: {e}")
-                duplicates.append(registerno)
+                logger.error(f"Error adding students {chunk[0][0]}..{chunk[-1][0]}: {e}")
+                inserted = set()
+            
+            for student in chunk:
+                if student in inserted:
+                    added.append(student[0])
+                    added_groups.add((student[1], student[2]))
+                else:
+                    duplicates.append(student[0])
+        
+        for department, semester in added_groups:
+            Student.refresh_batch_range(department, semester)
         
         return len(added), len(duplicates), duplicates
     
     @staticmethod
     def delete(registerno, department, semester):
         """Delete a student from the database."""
-        client = get_db()
         try:
-            result = client.table('students')\
-                .delete()\
-                .eq('registerno', registerno)\
-                .eq('department', department)\
-                .eq('semester', semester)\
-                .execute()
-            return len(result.data) > 0
+            deleted = get_storage().delete_student(registerno, department, semester)
+            if deleted:
+                Student.refresh_batch_range(department, semester)
+            return deleted
         except Exception as e:
             logger.error(f"Error deleting student: {e}")
             return False
     
+    @staticmethod
+    def refresh_batch_range(department, semester):
+        """Recompute the stored register-number range for a department and semester."""
+        try:
+            get_storage().refresh_batch_range(department, semester)
+        except Exception as e:
+            logger.error(f"Error refreshing batch range for {department} - {semester}: {e}")
+    
     @staticmethod
     def get_by_regno(registerno):
         """Get student info by registration number."""
         reg_num = normalize_regno(registerno)
-        client = get_db()
         
         try:
-            result = client.table('students')\
-                .select('registerno, department, semester')\
-                .eq('registerno', reg_num)\
-                .execute()
+            rows = get_storage().find_students(registerno=reg_num)
             
-            if result.data:
-                row = result.data[0]
+            if rows:
+                row = rows[0]
                 return {
                     'registerno': row['registerno'],
                     'department': row['department'],
@@ -95,23 +122,41 @@ class Student:
             logger.error(f"Error getting student by regno: {e}")
             return None
     
+    @staticmethod
+    def login_lookup(registerno):
+        """Get student info, submission status and batch range in one round trip.
+        Returns: dict with registerno, department, semester, submitted,
+        min_regno and max_regno, or None if the student does not exist.
+        """
+        reg_num = normalize_regno(registerno)
+
+        try:
+            row = get_storage().login_lookup(reg_num)
+
+            if row:
+                return {
+                    'registerno': row['registerno'],
+                    'department': row['department'],
+                    'semester': row['semester'],
+                    'submitted': bool(row['submitted']),
+                    'min_regno': row['min_regno'],
+                    'max_regno': row['max_regno']
+                }
+            return None
+        except Exception as e:
+            logger.error(f"Error during login lookup: {e}")
+            return None
+
     @staticmethod
     def get_by_dept_sem(department, semester):
         """Get all students for a department and semester."""
-        client = get_db()
-        
         try:
-            result = client.table('students')\
-                .select('registerno, department, semester')\
-                .eq('department', department)\
-                .eq('semester', semester)\
-                .order('registerno')\
-                .execute()
+            rows = get_storage().find_students(departments=[department], semesters=[semester])
             
             return [{'registerno': row['registerno'], 
                     'department': row['department'], 
                     'semester': row['semester']} 
-                    for row in result.data]
+                    for row in rows]
         except Exception as e:
             logger.error(f"Error getting students by dept/sem: {e}")
             return []
@@ -119,20 +164,13 @@ class Student:
     @staticmethod
     def get_all():
         """Get all students."""
-        client = get_db()
-        
         try:
-            result = client.table('students')\
-                .select('registerno, department, semester')\
-                .order('department')\
-                .order('semester')\
-                .order('registerno')\
-                .execute()
+            rows = get_storage().find_students()
             
             return [{'registerno': row['registerno'], 
                     'department': row['department'], 
                     'semester': row['semester']} 
-                    for row in result.data]
+                    for row in rows]
         except Exception as e:
             logger.error(f"Error getting all students: {e}")
             return []
@@ -141,16 +179,13 @@ class Student:
     def exists(registerno, department=None, semester=None):
         """Check if a student exists."""
         reg_num = normalize_regno(registerno)
-        client = get_db()
         
         try:
-            query = client.table('students').select('id').eq('registerno', reg_num)
-            
             if department and semester:
-                query = query.eq('department', department).eq('semester', semester)
-            
-            result = query.execute()
-            return len(result.data) > 0
+                rows = get_storage().find_students(reg_num, [department], [semester])
+            else:
+                rows = get_storage().find_students(registerno=reg_num)
+            return len(rows) > 0
         except Exception as e:
             logger.error(f"Error checking student existence: {e}")
             return False
@@ -158,11 +193,8 @@ class Student:
     @staticmethod
     def count():
         """Get total number of students."""
-        client = get_db()
-        
         try:
-            result = client.table('students').select('id', count='exact').execute()
-            return result.count if result.count else 0
+            return get_storage().count_students()
         except Exception as e:
             logger.error(f"Error counting students: {e}")
             return 0
@@ -0,0 +1,167 @@
+"""
+Process-local registry of register numbers that have submitted feedback.
+
+Numeric register numbers are stored as a bitmap: each bucket of 1024
+consecutive numbers is a single Python int used as a bitset, so a class of
+sixty students costs one small integer instead of sixty set entries.
+
+The registry is warmed from submitted_feedback, written through on every
+submission and periodically reconciled against the database so several
+uvicorn workers converge on the same view.
+"""
+
+import os
+import time
+import itertools
+import logging
+import threading
+from .storage import get_storage
+from utils import normalize_regno
+
+logger = logging.getLogger(__name__)
+
+# Seconds between incremental syncs (new rows only) and full reloads
+SYNC_INTERVAL = float(os.getenv('SUBMISSION_SYNC_INTERVAL', '30'))
+FULL_RELOAD_INTERVAL = float(os.getenv('SUBMISSION_FULL_RELOAD_INTERVAL', '600'))
+
+PAGE_SIZE = 1000
+_BUCKET_BITS = 10
+_BUCKET_MASK = (1 << _BUCKET_BITS) - 1
+
+class SubmissionRegistry:
+    def __init__(self, sync_interval=SYNC_INTERVAL, full_reload_interval=FULL_RELOAD_INTERVAL):
+        self.sync_interval = sync_interval
+        self.full_reload_interval = full_reload_interval
+        self._buckets = {}
+        self._other = set()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._watermark = None
+        # registerno of the row the watermark came from
+        self._watermark_regno = None
+        self._last_sync = 0.0
+        self._last_full_reload = 0.0
+        self.is_warm = False
+
+    def _add_locked(self, registerno):
+        reg_num = normalize_regno(registerno)
+        try:
+            value = int(reg_num)
+        except (ValueError, TypeError):
+            self._other.add(reg_num)
+            return
+        bucket = value >> _BUCKET_BITS
+        self._buckets[bucket] = self._buckets.get(bucket, 0) | (1 << (value & _BUCKET_MASK))
+
+    def add(self, registerno):
+        """Record a submission (write-through from the submit path)."""
+        with self._lock:
+            self._add_locked(registerno)
+
+    def __contains__(self, registerno):
+        reg_num = normalize_regno(registerno)
+        try:
+            value = int(reg_num)
+        except (ValueError, TypeError):
+            return reg_num in self._other
+        bitmap = self._buckets.get(value >> _BUCKET_BITS, 0)
+        return bool(bitmap >> (value & _BUCKET_MASK) & 1)
+
+    def __len__(self):
+        return sum(bin(bitmap).count('1') for bitmap in self._buckets.values()) + len(self._other)
+
+    def contains(self, registerno):
+        """Check membership, reconciling with the database first if the view is stale."""
+        self._maybe_sync()
+        return registerno in self
+
+    def clear(self):
+        """Forget all submissions (used when the feedback cycle is archived)."""
+        with self._lock:
+            self._buckets = {}
+            self._other = set()
+            self._watermark = None
+            self._watermark_regno = None
+            self.is_warm = False
+
+    def _fetch(self, since=None):
+        """Fetch submitted_feedback rows, optionally only those at or after `since`."""
+        return get_storage().fetch_submissions(since)
+
+    def warm(self):
+        """Load every submitted register number from the database."""
+        with self._sync_lock:
+            try:
+                rows = self._fetch()
+            except Exception as e:
+                logger.error(f"Error warming submission registry: {e}")
+                return False
+
+            with self._lock:
+                self._buckets = {}
+                self._other = set()
+                for row in rows:
+                    self._add_locked(row['registerno'])
+                self._watermark = rows[-1]['submitted_at'] if rows else None
+                self._watermark_regno = rows[-1]['registerno'] if rows else None
+                self.is_warm = True
+
+            now = time.monotonic()
+            self._last_sync = now
+            self._last_full_reload = now
+            logger.info(f"Submission registry warmed with {len(rows)} register numbers")
+            return True
+
+    def reconcile(self):
+        """
+        Pull submissions made by other workers since the last sync.
+
+        The fetch includes the row the watermark came from. If that row is
+        gone, submitted_feedback was emptied (an archive, possibly by another
+        worker) and the registry is reloaded in full instead.
+        """
+        with self._sync_lock:
+            watermark, watermark_regno = self._watermark, self._watermark_regno
+            try:
+                rows = self._fetch(since=watermark)
+            except Exception as e:
+                logger.error(f"Error reconciling submission registry: {e}")
+                return False
+
+            # Rows are ordered by submitted_at, so the watermark row is among the leading ones
+            truncated = watermark is not None and not any(
+                row['registerno'] == watermark_regno
+                for row in itertools.takewhile(lambda row: row['submitted_at'] == watermark, rows)
+            )
+            if not truncated:
+                with self._lock:
+                    for row in rows:
+                        self._add_locked(row['registerno'])
+                    if rows:
+                        self._watermark = rows[-1]['submitted_at']
+                        self._watermark_regno = rows[-1]['registerno']
+
+                self._last_sync = time.monotonic()
+                return True
+
+        logger.info("Submission watermark row is gone; reloading the submission registry")
+        return self.warm()
+
+    def sync_due(self):
+        """Whether the next contains() call would go to the database first."""
+        now = time.monotonic()
+        return (not self.is_warm
+                or now - self._last_full_reload >= self.full_reload_interval
+                or now - self._last_sync >= self.sync_interval)
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if not self.is_warm or now - self._last_full_reload >= self.full_reload_interval:
+            # Periodic full reloads remain as a backstop for any other removal
+            if not self._sync_lock.locked():
+                self.warm()
+        elif now - self._last_sync >= self.sync_interval:
+            if not self._sync_lock.locked():
+                self.reconcile()
+
+submission_registry = SubmissionRegistry()
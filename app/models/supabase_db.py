@@ -1,6 +1,9 @@
 import os
+import asyncio
 import logging
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, Client, AsyncClient
+from supabase.lib.client_options import SyncClientOptions, AsyncClientOptions
+from app.models.http_pool import create_http_client, create_async_http_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,6 +11,8 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 _supabase_client: Client = None
+_async_supabase_client: AsyncClient = None
+_async_client_lock = asyncio.Lock()
 
 def get_supabase_client() -> Client:
     """Get or create the Supabase client instance."""
@@ -22,11 +27,43 @@ def get_supabase_client() -> Client:
                 "SUPABASE_URL and SUPABASE_KEY must be set in environment variables or .env file"
             )
         
-        _supabase_client = create_client(supabase_url, supabase_key)
+        # Pool size, HTTP/2, timeouts and retries are configured in http_pool
+        options = SyncClientOptions(httpx_client=create_http_client())
+        _supabase_client = create_client(supabase_url, supabase_key, options=options)
         logger.info("Supabase client initialized successfully")
     
     return _supabase_client
 
+async def get_async_supabase_client() -> AsyncClient:
+    """Get or create the async Supabase client used by the ASGI student routes."""
+    global _async_supabase_client
+    
+    if _async_supabase_client is None:
+        async with _async_client_lock:
+            if _async_supabase_client is None:
+                supabase_url = os.getenv("SUPABASE_URL")
+                supabase_key = os.getenv("SUPABASE_KEY")
+                
+                if not supabase_url or not supabase_key:
+                    raise ValueError(
+                        "SUPABASE_URL and SUPABASE_KEY must be set in environment variables or .env file"
+                    )
+                
+                options = AsyncClientOptions(httpx_client=create_async_http_client())
+                _async_supabase_client = await acreate_client(supabase_url, supabase_key, options=options)
+                logger.info("Async Supabase client initialized successfully")
+    
+    return _async_supabase_client
+
+def reset_supabase_client():
+    """Drop the client (e.g. after a failed health check) so the next use rebuilds it."""
+    global _supabase_client
+    _supabase_client = None
+
+def reset_async_supabase_client():
+    global _async_supabase_client
+    _async_supabase_client = None
+
 def init_db():
     """
     Initialize the database schema in Supabase.
@@ -114,9 +151,313 @@ def init_db():
     CREATE TABLE IF NOT EXISTS submitted_feedback (
         id BIGSERIAL PRIMARY KEY,
         registerno TEXT NOT NULL UNIQUE,
+        submission_token TEXT,
         submitted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
     );
     
+    -- Existing databases: ALTER TABLE submitted_feedback ADD COLUMN IF NOT EXISTS submission_token TEXT;
+    
+    -- Running rating totals per staff/subject ("mainratings"), maintained by submit_feedback().
+    -- Sums and sums of squares give O(1) means and variances per question.
+    CREATE TABLE IF NOT EXISTS rating_aggregates (
+        department TEXT NOT NULL,
+        semester TEXT NOT NULL,
+        staff TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        response_count INTEGER NOT NULL DEFAULT 0,
+        q1_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q2_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q3_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q4_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q5_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q6_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q7_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q8_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q9_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q10_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q1_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q2_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q3_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q4_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q5_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q6_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q7_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q8_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q9_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        q10_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        average_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (department, semester, staff, subject)
+    );
+    
+    -- Existing databases: ALTER TABLE rating_aggregates
+    --     ADD COLUMN IF NOT EXISTS q1_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q2_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q3_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q4_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q5_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q6_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q7_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q8_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q9_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    --     ADD COLUMN IF NOT EXISTS q10_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0;
+    
+    -- Recompute rating_aggregates from raw ratings (python -m app.services.rating_aggregates rebuild).
+    -- Run once after creating the table to backfill existing ratings.
+    CREATE OR REPLACE FUNCTION rebuild_rating_aggregates()
+    RETURNS INTEGER
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        rebuilt INTEGER;
+    BEGIN
+        -- Hold off concurrent submissions so no increment is lost in between
+        LOCK TABLE ratings IN SHARE MODE;
+        DELETE FROM rating_aggregates WHERE TRUE;
+        
+        INSERT INTO rating_aggregates (department, semester, staff, subject, response_count,
+            q1_sum, q2_sum, q3_sum, q4_sum, q5_sum, q6_sum, q7_sum, q8_sum, q9_sum, q10_sum,
+            q1_sq_sum, q2_sq_sum, q3_sq_sum, q4_sq_sum, q5_sq_sum, q6_sq_sum, q7_sq_sum, q8_sq_sum, q9_sq_sum, q10_sq_sum,
+            average_sum)
+        SELECT department, semester, staff, subject, COUNT(*),
+               SUM(q1), SUM(q2), SUM(q3), SUM(q4), SUM(q5),
+               SUM(q6), SUM(q7), SUM(q8), SUM(q9), SUM(q10),
+               SUM(q1 * q1), SUM(q2 * q2), SUM(q3 * q3), SUM(q4 * q4), SUM(q5 * q5),
+               SUM(q6 * q6), SUM(q7 * q7), SUM(q8 * q8), SUM(q9 * q9), SUM(q10 * q10),
+               SUM(average)
+        FROM ratings
+        GROUP BY department, semester, staff, subject;
+        GET DIAGNOSTICS rebuilt = ROW_COUNT;
+        
+        RETURN rebuilt;
+    END;
+    $$;
+    
+    -- Batch register-number range and submission progress per department/semester.
+    -- Maintained by Student.add/bulk_add/delete through refresh_batch_range();
+    -- submitted_count is also incremented by submit_feedback().
+    CREATE TABLE IF NOT EXISTS student_batch_ranges (
+        department TEXT NOT NULL,
+        semester TEXT NOT NULL,
+        min_regno BIGINT,
+        max_regno BIGINT,
+        student_count INTEGER NOT NULL DEFAULT 0,
+        submitted_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (department, semester)
+    );
+    
+    -- Existing databases: ALTER TABLE student_batch_ranges
+    --     ADD COLUMN IF NOT EXISTS submitted_count INTEGER NOT NULL DEFAULT 0;
+    -- then re-run the backfill below.
+    
+    CREATE OR REPLACE FUNCTION refresh_batch_range(p_department TEXT, p_semester TEXT)
+    RETURNS VOID
+    LANGUAGE sql AS $$
+        INSERT INTO student_batch_ranges (department, semester, min_regno, max_regno,
+                                          student_count, submitted_count, updated_at)
+        SELECT p_department, p_semester,
+               MIN(s.registerno::BIGINT) FILTER (WHERE s.registerno ~ '^[0-9]+$'),
+               MAX(s.registerno::BIGINT) FILTER (WHERE s.registerno ~ '^[0-9]+$'),
+               COUNT(*),
+               COUNT(*) FILTER (WHERE EXISTS (
+                   SELECT 1 FROM submitted_feedback f WHERE f.registerno = s.registerno
+               )),
+               NOW()
+        FROM students s
+        WHERE s.department = p_department AND s.semester = p_semester
+        ON CONFLICT (department, semester) DO UPDATE SET
+            min_regno = EXCLUDED.min_regno,
+            max_regno = EXCLUDED.max_regno,
+            student_count = EXCLUDED.student_count,
+            submitted_count = EXCLUDED.submitted_count,
+            updated_at = EXCLUDED.updated_at;
+    $$;
+    
+    -- One-off backfill after creating the table:
+    -- SELECT refresh_batch_range(department, semester)
+    -- FROM (SELECT DISTINCT department, semester FROM students) t;
+    
+    -- Login lookup: student info, submission status and batch range in one call
+    CREATE OR REPLACE FUNCTION login_lookup(p_registerno TEXT)
+    RETURNS TABLE (
+        registerno TEXT,
+        department TEXT,
+        semester TEXT,
+        submitted BOOLEAN,
+        min_regno BIGINT,
+        max_regno BIGINT
+    )
+    LANGUAGE sql STABLE AS $$
+        SELECT s.registerno, s.department, s.semester,
+               EXISTS (SELECT 1 FROM submitted_feedback f WHERE f.registerno = p_registerno),
+               r.min_regno, r.max_regno
+        FROM students s
+        LEFT JOIN student_batch_ranges r
+            ON r.department = s.department AND r.semester = s.semester
+        WHERE s.registerno = p_registerno
+        LIMIT 1;
+    $$;
+    
+    -- Feedback submission: idempotent on registerno, all-or-nothing.
+    -- The submitted marker is claimed first; only the call that claims it inserts
+    -- ratings. A retry carrying the same submission token gets 'replayed' back,
+    -- any other call for an already-submitted student gets 'duplicate'.
+    -- Existing databases: DROP FUNCTION IF EXISTS submit_feedback(TEXT, JSONB);
+    CREATE OR REPLACE FUNCTION submit_feedback(p_registerno TEXT, p_token TEXT, p_ratings JSONB)
+    RETURNS TABLE (status TEXT, rating_count INTEGER)
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        existing_token TEXT;
+    BEGIN
+        INSERT INTO submitted_feedback (registerno, submission_token)
+        VALUES (p_registerno, p_token)
+        ON CONFLICT (registerno) DO NOTHING;
+        
+        IF NOT FOUND THEN
+            SELECT f.submission_token INTO existing_token
+            FROM submitted_feedback f WHERE f.registerno = p_registerno;
+            
+            status := CASE WHEN p_token IS NOT NULL AND existing_token = p_token
+                           THEN 'replayed' ELSE 'duplicate' END;
+            SELECT COUNT(*) INTO rating_count FROM ratings r WHERE r.registerno = p_registerno;
+            RETURN NEXT;
+            RETURN;
+        END IF;
+        
+        -- Live progress counter for the student's class
+        UPDATE student_batch_ranges b
+        SET submitted_count = b.submitted_count + 1, updated_at = NOW()
+        FROM students s
+        WHERE s.registerno = p_registerno
+          AND b.department = s.department AND b.semester = s.semester;
+        
+        WITH new_ratings AS (
+            INSERT INTO ratings (registerno, department, semester, staff, subject,
+                                 q1, q2, q3, q4, q5, q6, q7, q8, q9, q10, average)
+            SELECT r.registerno, r.department, r.semester, r.staff, r.subject,
+                   r.q1, r.q2, r.q3, r.q4, r.q5, r.q6, r.q7, r.q8, r.q9, r.q10, r.average
+            FROM jsonb_to_recordset(p_ratings) AS r(
+                registerno TEXT, department TEXT, semester TEXT, staff TEXT, subject TEXT,
+                q1 DOUBLE PRECISION, q2 DOUBLE PRECISION, q3 DOUBLE PRECISION,
+                q4 DOUBLE PRECISION, q5 DOUBLE PRECISION, q6 DOUBLE PRECISION,
+                q7 DOUBLE PRECISION, q8 DOUBLE PRECISION, q9 DOUBLE PRECISION,
+                q10 DOUBLE PRECISION, average DOUBLE PRECISION
+            )
+            RETURNING *
+        )
+        INSERT INTO rating_aggregates AS a (department, semester, staff, subject, response_count,
+            q1_sum, q2_sum, q3_sum, q4_sum, q5_sum, q6_sum, q7_sum, q8_sum, q9_sum, q10_sum,
+            q1_sq_sum, q2_sq_sum, q3_sq_sum, q4_sq_sum, q5_sq_sum, q6_sq_sum, q7_sq_sum, q8_sq_sum, q9_sq_sum, q10_sq_sum,
+            average_sum)
+        SELECT n.department, n.semester, n.staff, n.subject, COUNT(*),
+               SUM(n.q1), SUM(n.q2), SUM(n.q3), SUM(n.q4), SUM(n.q5),
+               SUM(n.q6), SUM(n.q7), SUM(n.q8), SUM(n.q9), SUM(n.q10),
+               SUM(n.q1 * n.q1), SUM(n.q2 * n.q2), SUM(n.q3 * n.q3), SUM(n.q4 * n.q4), SUM(n.q5 * n.q5),
+               SUM(n.q6 * n.q6), SUM(n.q7 * n.q7), SUM(n.q8 * n.q8), SUM(n.q9 * n.q9), SUM(n.q10 * n.q10),
+               SUM(n.average)
+        FROM new_ratings n
+        GROUP BY n.department, n.semester, n.staff, n.subject
+        ON CONFLICT (department, semester, staff, subject) DO UPDATE SET
+            response_count = a.response_count + EXCLUDED.response_count,
+            q1_sum = a.q1_sum + EXCLUDED.q1_sum,
+            q2_sum = a.q2_sum + EXCLUDED.q2_sum,
+            q3_sum = a.q3_sum + EXCLUDED.q3_sum,
+            q4_sum = a.q4_sum + EXCLUDED.q4_sum,
+            q5_sum = a.q5_sum + EXCLUDED.q5_sum,
+            q6_sum = a.q6_sum + EXCLUDED.q6_sum,
+            q7_sum = a.q7_sum + EXCLUDED.q7_sum,
+            q8_sum = a.q8_sum + EXCLUDED.q8_sum,
+            q9_sum = a.q9_sum + EXCLUDED.q9_sum,
+            q10_sum = a.q10_sum + EXCLUDED.q10_sum,
+            q1_sq_sum = a.q1_sq_sum + EXCLUDED.q1_sq_sum,
+            q2_sq_sum = a.q2_sq_sum + EXCLUDED.q2_sq_sum,
+            q3_sq_sum = a.q3_sq_sum + EXCLUDED.q3_sq_sum,
+            q4_sq_sum = a.q4_sq_sum + EXCLUDED.q4_sq_sum,
+            q5_sq_sum = a.q5_sq_sum + EXCLUDED.q5_sq_sum,
+            q6_sq_sum = a.q6_sq_sum + EXCLUDED.q6_sq_sum,
+            q7_sq_sum = a.q7_sq_sum + EXCLUDED.q7_sq_sum,
+            q8_sq_sum = a.q8_sq_sum + EXCLUDED.q8_sq_sum,
+            q9_sq_sum = a.q9_sq_sum + EXCLUDED.q9_sq_sum,
+            q10_sq_sum = a.q10_sq_sum + EXCLUDED.q10_sq_sum,
+            average_sum = a.average_sum + EXCLUDED.average_sum,
+            updated_at = NOW();
+        rating_count := jsonb_array_length(p_ratings);
+        
+        status := 'created';
+        RETURN NEXT;
+    END;
+    $$;
+    
+    -- Per staff/subject averages for one class (HOD report), read from rating_aggregates
+    CREATE OR REPLACE FUNCTION class_rating_summary(p_department TEXT, p_semesters TEXT[])
+    RETURNS TABLE (
+        staff TEXT,
+        subject TEXT,
+        q1_avg DOUBLE PRECISION,
+        q2_avg DOUBLE PRECISION,
+        q3_avg DOUBLE PRECISION,
+        q4_avg DOUBLE PRECISION,
+        q5_avg DOUBLE PRECISION,
+        q6_avg DOUBLE PRECISION,
+        q7_avg DOUBLE PRECISION,
+        q8_avg DOUBLE PRECISION,
+        q9_avg DOUBLE PRECISION,
+        q10_avg DOUBLE PRECISION,
+        response_count BIGINT
+    )
+    LANGUAGE sql STABLE AS $$
+        SELECT a.staff, a.subject,
+               SUM(a.q1_sum) / SUM(a.response_count),
+               SUM(a.q2_sum) / SUM(a.response_count),
+               SUM(a.q3_sum) / SUM(a.response_count),
+               SUM(a.q4_sum) / SUM(a.response_count),
+               SUM(a.q5_sum) / SUM(a.response_count),
+               SUM(a.q6_sum) / SUM(a.response_count),
+               SUM(a.q7_sum) / SUM(a.response_count),
+               SUM(a.q8_sum) / SUM(a.response_count),
+               SUM(a.q9_sum) / SUM(a.response_count),
+               SUM(a.q10_sum) / SUM(a.response_count),
+               SUM(a.response_count)
+        FROM rating_aggregates a
+        WHERE a.department = p_department AND a.semester = ANY(p_semesters)
+        GROUP BY a.staff, a.subject
+        HAVING SUM(a.response_count) > 0
+        ORDER BY a.staff, a.subject;
+    $$;
+    
+    -- Submission status for one class (non-submission report): counts plus the
+    -- students with no submitted_feedback row, found by an anti-join scoped to the class
+    CREATE OR REPLACE FUNCTION class_non_submissions(p_department TEXT, p_semesters TEXT[])
+    RETURNS TABLE (
+        total_students BIGINT,
+        submitted_count BIGINT,
+        non_submitted JSONB
+    )
+    LANGUAGE sql STABLE AS $$
+        WITH class_students AS (
+            SELECT s.registerno, s.department, s.semester
+            FROM students s
+            WHERE s.department = p_department AND s.semester = ANY(p_semesters)
+        ),
+        pending AS (
+            SELECT c.registerno, c.department, c.semester
+            FROM class_students c
+            WHERE NOT EXISTS (
+                SELECT 1 FROM submitted_feedback f WHERE f.registerno = c.registerno
+            )
+        )
+        SELECT (SELECT COUNT(*) FROM class_students),
+               (SELECT COUNT(*) FROM class_students) - (SELECT COUNT(*) FROM pending),
+               COALESCE(
+                   (SELECT jsonb_agg(jsonb_build_object(
+                        'registerno', p.registerno,
+                        'department', p.department,
+                        'semester', p.semester) ORDER BY p.registerno)
+                    FROM pending p),
+                   '[]'::jsonb
+               );
+    $$;
+    
     -- Enable Row Level Security (RLS) on all tables
     ALTER TABLE students ENABLE ROW LEVEL SECURITY;
     ALTER TABLE departments ENABLE ROW LEVEL SECURITY;
@@ -126,6 +467,8 @@ def init_db():
     ALTER TABLE admin_mappings ENABLE ROW LEVEL SECURITY;
     ALTER TABLE ratings ENABLE ROW LEVEL SECURITY;
     ALTER TABLE submitted_feedback ENABLE ROW LEVEL SECURITY;
+    ALTER TABLE student_batch_ranges ENABLE ROW LEVEL SECURITY;
+    ALTER TABLE rating_aggregates ENABLE ROW LEVEL SECURITY;
     
     -- Create policies for service role (full access)
     CREATE POLICY "Enable all access for service role" ON students FOR ALL USING (true);
@@ -136,6 +479,8 @@ def init_db():
     CREATE POLICY "Enable all access for service role" ON admin_mappings FOR ALL USING (true);
     CREATE POLICY "Enable all access for service role" ON ratings FOR ALL USING (true);
     CREATE POLICY "Enable all access for service role" ON submitted_feedback FOR ALL USING (true);
+    CREATE POLICY "Enable all access for service role" ON student_batch_ranges FOR ALL USING (true);
+    CREATE POLICY "Enable all access for service role" ON rating_aggregates FOR ALL USING (true);
     """
     try:
         client = get_supabase_client()
@@ -68,20 +68,20 @@ def process_student_excel(file_path: str) -> Tuple[bool, str, dict]:
     if not is_valid:
         return False, error_msg, {}
     
-    # Prepare students data
-    students_data = []
-    for _, row in df.iterrows():
-        students_data.append((
-            str(row['registerno']),
-            str(row['department']),
-            str(row['semester'])
-        ))
+    # Drop repeated rows within the file (vectorized)
+    key_columns = ['registerno', 'department', 'semester']
+    in_file_duplicates = df.duplicated(subset=key_columns, keep='first')
+    file_duplicates = df.loc[in_file_duplicates, 'registerno'].tolist()
+    
+    students_data = list(df.loc[~in_file_duplicates, key_columns].itertuples(index=False, name=None))
     
     # Add students in bulk
     added_count, duplicate_count, duplicates = Student.bulk_add(students_data)
+    duplicates = file_duplicates + duplicates
+    duplicate_count += len(file_duplicates)
     
     stats = {
-        'total': len(students_data),
+        'total': len(df),
         'added': added_count,
         'duplicates': duplicate_count,
         'duplicate_list': duplicates[:20]  # Limit to first 20 for display
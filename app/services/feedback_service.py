@@ -0,0 +1,88 @@
+"""
+Request-independent pieces of the student login and feedback flow, shared by
+the Flask views in app.py and the async routes in routes/student_async.py.
+"""
+
+from typing import List, Optional, Tuple
+
+# Larger spans mean the batch's student list was uploaded wrongly
+MAX_BATCH_RANGE = 600
+
+def batch_range_exceeded(login_info: dict) -> bool:
+    """Check whether the student's batch spans more than MAX_BATCH_RANGE register numbers."""
+    min_reg = login_info.get("min_regno")
+    max_reg = login_info.get("max_regno")
+    if min_reg is None or max_reg is None:
+        return False
+    return (int(max_reg) - int(min_reg)) > MAX_BATCH_RANGE
+
+def mapping_semester_variations(semester_norm: str) -> List[str]:
+    """Semester spellings admin mappings may be stored under."""
+    return [
+        semester_norm,
+        f"Semester {semester_norm}",
+        f"Semester Semester {semester_norm}",
+    ]
+
+def mapping_rows(rows: List[dict]) -> List[dict]:
+    return [
+        {
+            "department": row["department"],
+            "semester": row["semester"],
+            "staff": row["staff"],
+            "subject": row["subject"],
+        }
+        for row in rows
+    ]
+
+def collect_rating_rows(form, mappings: List[dict], department: str, semester: str,
+                        registerno: str) -> Tuple[List[dict], Optional[str]]:
+    """
+    Read the rating-<mapping>-<question> fields of a submitted feedback form.
+
+    Returns:
+        Tuple of (rating_rows, error_message); error_message is None when
+        every rating is present and numeric
+    """
+    rating_rows = []
+    for idx, mapping in enumerate(mappings):
+        ratings_dict = {}
+        ratings = []
+        for q in range(1, 11):
+            value = form.get(f"rating-{idx}-{q}")
+            if not value:
+                return rating_rows, f"Please fill all rating boxes for {mapping['staff']}."
+            try:
+                score = float(value)
+            except ValueError:
+                return rating_rows, f"Invalid rating value for {mapping['staff']}."
+            ratings.append(score)
+            ratings_dict[f"q{q}"] = f"{score:.2f}"
+
+        average = sum(ratings) / len(ratings)
+        row_data = {
+            "registerno": registerno,  # Store registerno without encryption
+            "department": department,
+            "semester": semester,
+            "staff": mapping["staff"],
+            "subject": mapping["subject"],
+            "average": f"{average:.2f}",
+        }
+        row_data.update(ratings_dict)
+        rating_rows.append(row_data)
+    return rating_rows, None
+
+def rating_payload(rating_rows: List[dict]) -> List[dict]:
+    """Rating rows in the shape the submit_feedback() database function expects."""
+    return [
+        {
+            "registerno": row["registerno"],
+            "department": row["department"],
+            "semester": row["semester"],
+            "staff": row["staff"],
+            "subject": row["subject"],
+            **{f"q{i}": float(row[f"q{i}"]) for i in range(1, 11)},
+            "average": float(row["average"]),
+        }
+        for row in rating_rows
+    ]
@@ -2,16 +2,79 @@
 Service for handling Excel file uploads for staff-subject mapping data.
 """
 
+import os
+import time
+import threading
 import pandas as pd
 import logging
-from typing import Tuple, List
-from app.models.database import get_db
+from typing import Tuple, List, Optional
+from app.models.storage import get_storage
+from app.services.cache import TTLCache
+from app.services.reference_data import invalidate_reference_data
+from utils import normalize_semester
 
 logger = logging.getLogger(__name__)
 
 # Required headers for mapping Excel file
 MAPPING_REQUIRED_HEADERS = ['department', 'semester', 'staff', 'subject']
 
+# Rows per multi-row insert request
+INSERT_CHUNK_SIZE = 500
+
+# Mappings per (department, normalized semester); identical for a whole class
+mapping_cache = TTLCache(
+    maxsize=int(os.getenv('MAPPING_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('MAPPING_CACHE_TTL', '300'))
+)
+
+# invalidate_mapping_cache() only reaches the worker that made the change.
+# Every worker also compares the admin_mappings version (row count, highest
+# id) at most this often and drops its cache when it moved, so other
+# workers serve edited mappings for at most this many seconds.
+MAPPING_VERSION_INTERVAL = float(os.getenv('MAPPING_VERSION_INTERVAL', '5'))
+
+_mapping_version = None
+_version_checked_at = float('-inf')
+_version_lock = threading.Lock()
+
+def mapping_cache_key(department: str, semester: str) -> Tuple[str, str]:
+    """Cache key for a class's mappings."""
+    return (str(department).strip(), normalize_semester(str(semester)))
+
+def invalidate_mapping_cache(department: Optional[str] = None, semester: Optional[str] = None):
+    """Drop cached mappings for one department/semester, or all of them."""
+    if department is None or semester is None:
+        mapping_cache.invalidate()
+    else:
+        mapping_cache.invalidate(mapping_cache_key(department, semester))
+
+def mapping_version_due() -> bool:
+    """True when the next cached_mappings() call will query the mapping version."""
+    return time.monotonic() - _version_checked_at >= MAPPING_VERSION_INTERVAL
+
+def check_mapping_version():
+    """Drop every cached mapping if admin_mappings changed since the last check."""
+    global _mapping_version, _version_checked_at
+    if not mapping_version_due():
+        return
+    with _version_lock:
+        if not mapping_version_due():
+            return
+        _version_checked_at = time.monotonic()
+        try:
+            version = get_storage().mapping_version()
+        except Exception as e:
+            logger.error(f"Error checking mapping version: {e}")
+            return
+        if _mapping_version is not None and version != _mapping_version:
+            mapping_cache.invalidate()
+        _mapping_version = version
+
+def cached_mappings(key: Tuple[str, str]) -> Optional[list]:
+    """Cached mappings for a mapping_cache_key, or None. Checks the version first when due."""
+    check_mapping_version()
+    return mapping_cache.get(key)
+
 def validate_mapping_excel(file_path: str) -> Tuple[bool, str, pd.DataFrame]:
     """
     Validate the uploaded mapping Excel file.
@@ -55,6 +118,10 @@ def process_mapping_excel(file_path: str, replace_existing: bool = False) -> Tup
     """
     Process the uploaded Excel file and add mappings to database.
     
+    Rows are handled per (department, semester) group: at most one delete
+    (when replacing), one prefetch of existing mappings and chunked bulk
+    inserts per group.
+    
     Args:
         file_path: Path to the Excel file
         replace_existing: If True, delete existing mappings for the dept/sem before adding new ones
@@ -62,63 +129,69 @@ def process_mapping_excel(file_path: str, replace_existing: bool = False) -> Tup
     Returns:
         Tuple of (success, message, stats_dict)
     """
+    started = time.perf_counter()
     is_valid, error_msg, df = validate_mapping_excel(file_path)
     if not is_valid:
         return False, error_msg, {}
     
     try:
-        client = get_db()
+        storage = get_storage()
         
         added_count = 0
         skipped_count = 0
-        dept_sem_combinations = set()
+        group_stats = []
         
-        for _, row in df.iterrows():
-            dept = str(row['department'])
-            sem = str(row['semester'])
-            staff = str(row['staff'])
-            subject = str(row['subject'])
-            
-            dept_sem_key = (dept, sem)
+        for (dept, sem), group in df.groupby(['department', 'semester'], sort=False):
+            in_file_duplicates = group.duplicated(subset=['staff', 'subject'], keep='first')
+            pairs = list(group.loc[~in_file_duplicates, ['staff', 'subject']].itertuples(index=False, name=None))
+            group_added = 0
+            group_skipped = int(in_file_duplicates.sum())
             
-            # If replace_existing is True and this is first record for this dept/sem, delete existing
-            if replace_existing and dept_sem_key not in dept_sem_combinations:
-                client.table('admin_mappings')\
-                    .delete()\
-                    .eq('department', dept)\
-                    .eq('semester', sem)\
-                    .execute()
-                dept_sem_combinations.add(dept_sem_key)
-            
-            # Try to insert the mapping
             try:
-                # Check if mapping already exists
-                existing = client.table('admin_mappings')\
-                    .select('id')\
-                    .eq('department', dept)\
-                    .eq('semester', sem)\
-                    .eq('staff', staff)\
-                    .eq('subject', subject)\
-                    .execute()
-                
-                if not existing.data:
-                    client.table('admin_mappings').insert({
-                        'department': dept,
-                        'semester': sem,
-                        'staff': staff,
-                        'subject': subject
-                    }).execute()
-                    added_count += 1
+                if replace_existing:
+                    storage.delete_mappings(dept, sem)
+                    existing = set()
                 else:
-                    skipped_count += 1
+                    existing = {(row['staff'], row['subject'])
+                                for row in storage.find_mappings(dept, sem)}
+                
+                new_pairs = [pair for pair in pairs if pair not in existing]
+                group_skipped += len(pairs) - len(new_pairs)
+                
+                for start in range(0, len(new_pairs), INSERT_CHUNK_SIZE):
+                    chunk = new_pairs[start:start + INSERT_CHUNK_SIZE]
+                    try:
+                        inserted = storage.insert_mappings(
+                            [{'department': dept, 'semester': sem, 'staff': staff, 'subject': subject}
+                             for staff, subject in chunk]
+                        )
+                    except Exception as e:
+                        logger.error(f"Error inserting mappings for {dept} - {sem}: {e}")
+                        inserted = 0
+                    group_added += inserted
+                    group_skipped += len(chunk) - inserted
             except Exception as e:
-                logger.error(f"Error inserting mapping: {e}")
-                skipped_count += 1
+                logger.error(f"Error importing mappings for {dept} - {sem}: {e}")
+                group_skipped = len(group) - group_added
+            finally:
+                invalidate_mapping_cache(dept, sem)
+            
+            added_count += group_added
+            skipped_count += group_skipped
+            group_stats.append({
+                'department': dept,
+                'semester': sem,
+                'total': len(group),
+                'added': group_added,
+                'skipped': group_skipped
+            })
         
         stats = {
             'total': len(df),
             'added': added_count,
-            'skipped': skipped_count
+            'skipped': skipped_count,
+            'groups': group_stats,
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
         }
         
         if added_count > 0:
@@ -149,38 +222,65 @@ def create_sample_mapping_excel(output_path: str = 'sample_mapping.xlsx'):
     logger.info(f"Sample mapping Excel file created: {output_path}")
     return output_path
 
-def bulk_add_staff(staff_list: List[str]) -> Tuple[int, int]:
+# Names per `in_` lookup; keeps the PostgREST query string a sane length
+LOOKUP_CHUNK_SIZE = 100
+
+def _bulk_add_names(table: str, names: List[str]) -> Tuple[int, int]:
     """
-    Bulk add staff members.
+    Add names to a reference table (staff/subjects) that has a UNIQUE name column.
+    
+    Names are stripped and deduplicated in memory, existing ones are fetched
+    with chunked `in_` lookups and the rest go in as one multi-row insert.
     
     Returns:
         Tuple of (added_count, duplicate_count)
     """
-    added_count = 0
-    duplicate_count = 0
+    cleaned = [name.strip() for name in names if name and name.strip()]
+    unique_names = list(dict.fromkeys(cleaned))
+    duplicate_count = len(cleaned) - len(unique_names)
     
-    client = get_db()
+    if not unique_names:
+        return 0, duplicate_count
     
-    for staff_name in staff_list:
-        staff_name = staff_name.strip()
-        if not staff_name:
-            continue
-        
+    storage = get_storage()
+    
+    try:
+        existing = set()
+        for start in range(0, len(unique_names), LOOKUP_CHUNK_SIZE):
+            chunk = unique_names[start:start + LOOKUP_CHUNK_SIZE]
+            existing.update(storage.existing_reference_names(table, chunk))
+    except Exception as e:
+        logger.error(f"Error checking existing {table}: {e}")
+        return 0, len(cleaned)
+    
+    new_names = [name for name in unique_names if name not in existing]
+    duplicate_count += len(unique_names) - len(new_names)
+    added_count = 0
+    
+    for start in range(0, len(new_names), INSERT_CHUNK_SIZE):
+        chunk = new_names[start:start + INSERT_CHUNK_SIZE]
         try:
-            # Check if staff already exists
-            existing = client.table('staff').select('name').eq('name', staff_name).execute()
-            
-            if not existing.data:
-                client.table('staff').insert({'name': staff_name}).execute()
-                added_count += 1
-            else:
-                duplicate_count += 1
+            inserted = storage.insert_reference_names(table, chunk)
         except Exception as e:
-            logger.error(f"Error adding staff {staff_name}: {e}")
-            duplicate_count += 1
+            logger.error(f"Error adding {table}: {e}")
+            inserted = 0
+        added_count += inserted
+        duplicate_count += len(chunk) - inserted
+    
+    if added_count:
+        invalidate_reference_data(table)
     
     return added_count, duplicate_count
 
+def bulk_add_staff(staff_list: List[str]) -> Tuple[int, int]:
+    """
+    Bulk add staff members.
+    
+    Returns:
+        Tuple of (added_count, duplicate_count)
+    """
+    return _bulk_add_names('staff', staff_list)
+
 def bulk_add_subjects(subject_list: List[str]) -> Tuple[int, int]:
     """
     Bulk add subjects.
@@ -188,27 +288,4 @@ def bulk_add_subjects(subject_list: List[str]) -> Tuple[int, int]:
     Returns:
         Tuple of (added_count, duplicate_count)
     """
-    added_count = 0
-    duplicate_count = 0
-    
-    client = get_db()
-    
-    for subject_name in subject_list:
-        subject_name = subject_name.strip()
-        if not subject_name:
-            continue
-        
-        try:
-            # Check if subject already exists
-            existing = client.table('subjects').select('name').eq('name', subject_name).execute()
-            
-            if not existing.data:
-                client.table('subjects').insert({'name': subject_name}).execute()
-                added_count += 1
-            else:
-                duplicate_count += 1
-        except Exception as e:
-            logger.error(f"Error adding subject {subject_name}: {e}")
-            duplicate_count += 1
-    
-    return added_count, duplicate_count
+    return _bulk_add_names('subjects', subject_list)
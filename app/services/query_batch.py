@@ -0,0 +1,81 @@
+"""
+Request-scoped batching for independent database reads.
+
+Handlers that need several unrelated reads (reference lists, distinct
+values, counts) used to issue them one after another, so their latency was
+the sum of the round trips. gather() runs them concurrently on a shared
+thread pool, making it roughly the slowest single read. Each call names its
+own key, and calls sharing a key while serving the same request run only
+once:
+
+    departments, semesters = gather(('departments', load_departments),
+                                    ('semesters', load_semesters))
+
+Only use it for reads: calls run in any order, and a key must identify the
+result (two calls with the same key get the first call's result). A key of
+None opts out of deduplication.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Threads shared by all requests in this worker for concurrent reads
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS,
+                                               thread_name_prefix='query-batch')
+    return _executor
+
+class QueryBatch:
+    """Concurrent reads for one request, deduplicated by caller-supplied key."""
+
+    def __init__(self):
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> Future:
+        if key is None:
+            return _get_executor().submit(fn, *args)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = _get_executor().submit(fn, *args)
+                self._futures[key] = future
+            return future
+
+    def gather(self, *calls: Tuple) -> List[Any]:
+        """
+        Run (key, fn, *args) calls concurrently.
+
+        Returns:
+            Results in call order. The first failing call's exception is raised
+        """
+        futures = [self.submit(key, fn, *args) for key, fn, *args in calls]
+        return [future.result() for future in futures]
+
+def request_batch() -> QueryBatch:
+    """The current request's batch; a fresh one outside a request."""
+    if not has_app_context():
+        return QueryBatch()
+    batch = g.get('query_batch')
+    if batch is None:
+        batch = g.query_batch = QueryBatch()
+    return batch
+
+def gather(*calls: Tuple) -> List[Any]:
+    """Run independent (key, fn, *args) reads concurrently within the current request's batch."""
+    return request_batch().gather(*calls)
@@ -0,0 +1,135 @@
+"""
+Running rating aggregates per (department, semester, staff, subject).
+
+submit_feedback() adds every submission to rating_aggregates: a response
+count plus, for each of q1..q10, the sum and the sum of squares. Means and
+variances are derived from those three numbers, so they never touch the raw
+ratings table.
+
+Rebuild the table from raw ratings (e.g. after a manual data fix) with:
+
+    python -m app.services.rating_aggregates rebuild
+"""
+
+import sys
+import argparse
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.models.storage import get_storage
+from app.services.report_service import semester_variations
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS = range(1, 11)
+
+def question_mean(row: dict, question: int) -> Optional[float]:
+    """Mean rating for one question, or None when there are no responses."""
+    count = row['response_count']
+    if not count:
+        return None
+    return row[f'q{question}_sum'] / count
+
+def question_variance(row: dict, question: int, sample: bool = False) -> Optional[float]:
+    """
+    Variance of one question's ratings from the stored sums.
+
+    Population variance by default; `sample=True` applies Bessel's correction
+    and needs at least two responses.
+    """
+    count = row['response_count']
+    if not count or (sample and count < 2):
+        return None
+    total = row[f'q{question}_sum']
+    # Clamp tiny negative values left over from floating point cancellation
+    squared_deviation = max(row[f'q{question}_sq_sum'] - total * total / count, 0.0)
+    return squared_deviation / (count - 1 if sample else count)
+
+def aggregate_statistics(row: dict) -> dict:
+    """Count, per-question means and variances, and overall mean for one aggregate row."""
+    count = row['response_count']
+    return {
+        'staff': row['staff'],
+        'subject': row['subject'],
+        'response_count': count,
+        'means': [question_mean(row, i) for i in QUESTIONS],
+        'variances': [question_variance(row, i) for i in QUESTIONS],
+        'average': row['average_sum'] / count if count else None
+    }
+
+def get_rating_aggregates(department: str = None, semester: str = None) -> List[dict]:
+    """Raw aggregate rows, optionally limited to a department and/or semester."""
+    return get_storage().rating_aggregates(
+        department.strip() if department else None,
+        semester_variations(semester) if semester else None
+    )
+
+def merge_aggregates(rows: List[dict]) -> List[dict]:
+    """
+    Combine rows for the same staff and subject (a class whose semester was
+    stored under several spellings). Sums and counts add, so the merged row
+    still yields exact means and variances.
+    """
+    merged: Dict[Tuple[str, str], dict] = defaultdict(lambda: defaultdict(float))
+    for row in rows:
+        target = merged[(row['staff'].strip(), row['subject'].strip())]
+        for column, value in row.items():
+            if column.endswith('_sum') or column == 'response_count':
+                target[column] += value or 0
+
+    combined = []
+    for (staff, subject), sums in sorted(merged.items()):
+        sums = dict(sums)
+        sums['response_count'] = int(sums['response_count'])
+        sums.update({'staff': staff, 'subject': subject})
+        combined.append(sums)
+    return combined
+
+def get_class_statistics(department: str, semester: str) -> List[dict]:
+    """Per staff/subject count, means and variances for one class."""
+    rows = merge_aggregates(get_rating_aggregates(department, semester))
+    return [aggregate_statistics(row) for row in rows if row['response_count']]
+
+def rebuild_rating_aggregates() -> int:
+    """
+    Recompute rating_aggregates from the raw ratings table.
+
+    Returns:
+        Number of aggregate rows written
+    """
+    rebuilt = get_storage().rebuild_rating_aggregates()
+    logger.info(f"Rebuilt {rebuilt} rating aggregate rows")
+    return rebuilt
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Maintain the rating_aggregates summary table.')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    subcommands.add_parser('rebuild', help='recompute every aggregate from the raw ratings table')
+
+    show = subcommands.add_parser('show', help='print counts, means and variances for a class')
+    show.add_argument('department')
+    show.add_argument('semester')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'rebuild':
+        try:
+            rebuilt = rebuild_rating_aggregates()
+        except Exception as e:
+            logger.error(f"Error rebuilding rating aggregates: {e}")
+            return 1
+        print(f"Rebuilt {rebuilt} rating aggregate rows")
+        return 0
+
+    for stats in get_class_statistics(args.department, args.semester):
+        means = ' '.join(f"{m:.2f}" for m in stats['means'])
+        variances = ' '.join(f"{v:.2f}" for v in stats['variances'])
+        print(f"{stats['staff']} / {stats['subject']} (n={stats['response_count']})")
+        print(f"  mean: {means}")
+        print(f"  var:  {variances}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
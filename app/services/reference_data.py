@@ -0,0 +1,99 @@
+"""
+Shared cache for the reference name lists (departments, semesters, staff, subjects).
+
+Every admin and HOD page needs some of these lists. They change rarely, so
+each one is loaded once, kept for REFERENCE_CACHE_TTL seconds and dropped
+early whenever the app itself adds names.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import List, Tuple
+from app.models.storage import get_storage
+from app.services.query_batch import gather
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_TABLES = ('departments', 'semesters', 'staff', 'subjects')
+
+CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', '300'))
+
+# version counts content changes seen by this process; etag is a content hash
+# so it matches across workers
+ReferenceEntry = namedtuple('ReferenceEntry', 'names version etag last_modified expires_at')
+
+_entries = {}
+# One lock per table so different lists can be (re)loaded concurrently
+_locks = {table: threading.Lock() for table in REFERENCE_TABLES}
+
+def _load(table: str, previous: ReferenceEntry = None) -> ReferenceEntry:
+    names = get_storage().reference_names(table)
+    etag = hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()[:16]
+
+    if previous is not None and previous.etag == etag:
+        version, last_modified = previous.version, previous.last_modified
+    else:
+        version = previous.version + 1 if previous is not None else 1
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+    return ReferenceEntry(names, version, etag, last_modified, time.monotonic() + CACHE_TTL)
+
+def get_reference_entry(table: str) -> ReferenceEntry:
+    """Return the cached entry for a reference table, loading it if missing or expired."""
+    if table not in REFERENCE_TABLES:
+        raise ValueError(f"Unknown reference table: {table}")
+
+    entry = _entries.get(table)
+    if _is_fresh(entry):
+        return entry
+
+    with _locks[table]:
+        entry = _entries.get(table)
+        if _is_fresh(entry):
+            return entry
+        entry = _load(table, entry)
+        _entries[table] = entry
+        return entry
+
+def _is_fresh(entry: ReferenceEntry) -> bool:
+    return entry is not None and entry.expires_at > time.monotonic()
+
+def get_reference_entries(*tables: str) -> List[ReferenceEntry]:
+    """Entries for several tables; missing or expired ones are loaded concurrently."""
+    stale = [table for table in tables if not _is_fresh(_entries.get(table))]
+    if len(stale) > 1:
+        gather(*[(('reference_entry', table), get_reference_entry, table) for table in stale])
+    return [get_reference_entry(table) for table in tables]
+
+def get_reference_list(table: str) -> List[str]:
+    """Return the ordered names in a reference table."""
+    return get_reference_entry(table).names
+
+def get_reference_lists(*tables: str) -> List[List[str]]:
+    """Return the ordered names of several reference tables, in argument order."""
+    return [entry.names for entry in get_reference_entries(*tables)]
+
+def reference_validators(*tables: str) -> Tuple[str, datetime]:
+    """
+    Combined ETag and Last-Modified for a set of reference tables.
+
+    Returns:
+        Tuple of (etag, last_modified)
+    """
+    entries = get_reference_entries(*tables)
+    etag = '-'.join(entry.etag for entry in entries)
+    last_modified = max(entry.last_modified for entry in entries)
+    return etag, last_modified
+
+def invalidate_reference_data(*tables: str):
+    """Expire cached lists so the next read reloads them. No arguments expires all."""
+    for table in tables or REFERENCE_TABLES:
+        with _locks[table]:
+            entry = _entries.get(table)
+            if entry is not None:
+                _entries[table] = entry._replace(expires_at=0.0)
@@ -0,0 +1,389 @@
+"""
+Background report rendering.
+
+Matplotlib and ReportLab are CPU bound and hold the GIL, so rendering a PDF
+inside the web process stalls every other request it serves. Report jobs run
+in a small process pool instead; the web process only fetches the (cheap)
+aggregated data, waits on an event and hands back the bytes.
+
+The worker that accepts a job runs it and keeps it in memory. Jobs submitted
+for polling (submit(), behind POST /hod/reports/jobs) also have their status
+and, once done, their result bytes written under REPORT_JOB_DIR, so any
+uvicorn worker on the host can answer the status and result URLs. Jobs a
+request waits on itself stay in memory only.
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import zipfile
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, Optional
+from app.services.report_service import (get_class_feedback_data, get_all_feedback_data,
+                                         feedback_report_kwargs, feedback_fingerprint,
+                                         get_cached_feedback_report, cache_feedback_report)
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+# Seconds a finished job (and its PDF) is kept for polling clients
+REPORT_JOB_TTL = float(os.getenv('REPORT_JOB_TTL', '900'))
+REPORT_TIMEOUT = float(os.getenv('REPORT_TIMEOUT', '120'))
+# Shared by every worker process on the host
+REPORT_JOB_DIR = os.getenv('REPORT_JOB_DIR', os.path.join('data', 'report_jobs'))
+# Seconds between sweeps of expired job files
+REPORT_JOB_PRUNE_INTERVAL = float(os.getenv('REPORT_JOB_PRUNE_INTERVAL', '60'))
+
+JOB_KINDS = ('feedback', 'non_submission', 'batch')
+BATCH_FORMATS = ('zip', 'pdf')
+
+def _render_non_submission(department, semester):
+    # Runs in a pool process, which opens its own database client
+    from report_non_submission import generate_non_submission_report
+    report = generate_non_submission_report(department, semester)
+    if not report:
+        raise ValueError("PDF file was not generated properly")
+    return report
+
+class ReportJob:
+    def __init__(self, kind: str, department: str, semester: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.department = department
+        self.semester = semester
+        self.status = 'queued'
+        self.filename = None
+        self.pdf = None
+        self.fingerprint = None
+        self.error = None
+        self.content_type = 'application/pdf'
+        # Progress in classes; single-class jobs count as one
+        self.total = 1
+        self.completed = 0
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.store = None
+        self._done = threading.Event()
+
+    def save(self):
+        """Publish the current state to the shared store, if any."""
+        if self.store is not None:
+            self.store.save(self)
+
+    def advance(self):
+        """Count one more class as rendered."""
+        self.completed += 1
+        self.save()
+
+    def finish(self, filename: str = None, pdf: bytes = None, error: str = None):
+        self.filename = filename
+        self.pdf = pdf
+        self.error = error
+        self.status = 'failed' if error else 'done'
+        if not error:
+            self.completed = self.total
+        self.finished_at = time.time()
+        self.save()
+        self._done.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job finishes. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def to_dict(self) -> dict:
+        status = self.status
+        if status == 'queued' and self.future is not None and self.future.running():
+            status = 'running'
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'department': self.department,
+            'semester': self.semester,
+            'status': status,
+            'filename': self.filename,
+            'error': self.error,
+            'total': self.total,
+            'completed': self.completed,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+class ReportJobStore:
+    """
+    Job state as files in a directory shared by the worker processes:
+    <job_id>.json holds the status and <job_id>.result the finished bytes.
+    Both are replaced atomically, and the result is written before the
+    status that announces it.
+    """
+
+    def __init__(self, directory: str = REPORT_JOB_DIR):
+        self.directory = directory
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, job: ReportJob):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if job.pdf is not None:
+                self._write(self._path(job.id, 'result'), job.pdf)
+            state = job.to_dict()
+            state.update(content_type=job.content_type, fingerprint=job.fingerprint)
+            self._write(self._path(job.id, 'json'), json.dumps(state).encode('utf-8'))
+        except OSError as e:
+            logger.error(f"Error saving report job {job.id}: {e}")
+
+    def load(self, job_id: str) -> Optional[ReportJob]:
+        """A read-only copy of a job saved by any worker, or None if unknown."""
+        # job ids are uuid4 hex; anything else cannot name a file of ours
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id, 'json'), 'rb') as f:
+                state = json.loads(f.read())
+            job = ReportJob(state['kind'], state['department'], state['semester'])
+            job.id = job_id
+            for field in ('status', 'filename', 'error', 'total', 'completed', 'created_at',
+                          'finished_at', 'content_type', 'fingerprint'):
+                setattr(job, field, state[field])
+            if job.status in ('done', 'failed'):
+                if job.status == 'done':
+                    with open(self._path(job_id, 'result'), 'rb') as f:
+                        job.pdf = f.read()
+                job._done.set()
+            return job
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading report job {job_id}: {e}")
+            return None
+
+    def prune(self, max_age: float):
+        """Delete the files of jobs not updated for max_age seconds."""
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                # Already removed by another worker
+                pass
+
+class ReportJobQueue:
+    def __init__(self, max_workers: int = REPORT_WORKERS, job_ttl: float = REPORT_JOB_TTL,
+                 store: ReportJobStore = None):
+        self.max_workers = max_workers
+        self.job_ttl = job_ttl
+        self.store = store or ReportJobStore()
+        self._jobs: Dict[str, ReportJob] = {}
+        self._pool = None
+        self._lock = threading.Lock()
+        self._store_pruned_at = float('-inf')
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: pool processes must not inherit the parent's HTTP client
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _run(self, job: ReportJob, fn, *args, **kwargs):
+        try:
+            job.future = self._executor().submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); start a fresh pool once
+            self._reset_executor()
+            job.future = self._executor().submit(fn, *args, **kwargs)
+
+        def on_done(future):
+            try:
+                filename, pdf = future.result()
+            except Exception as e:
+                logger.error(f"Report job {job.id} ({job.kind}) failed: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor()
+                job.finish(error=str(e))
+                return
+            if job.kind == 'feedback':
+                cache_feedback_report(job.department, job.semester, job.fingerprint, filename, pdf)
+            job.finish(filename, pdf)
+
+        job.future.add_done_callback(on_done)
+
+    def _register(self, job: ReportJob, shared: bool = False) -> ReportJob:
+        """Track a job; shared jobs are also published to the store for other workers."""
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job.id] = job
+            prune_store = shared and time.monotonic() - self._store_pruned_at >= REPORT_JOB_PRUNE_INTERVAL
+            if prune_store:
+                self._store_pruned_at = time.monotonic()
+        if prune_store:
+            self.store.prune(self.job_ttl)
+        if shared:
+            job.store = self.store
+            job.save()
+        return job
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit_feedback_report(self, department: str, semester: str,
+                               feedback_data: Dict[str, dict] = None, shared: bool = False) -> ReportJob:
+        """Queue a feedback report. A cached render finishes the job immediately."""
+        job = self._register(ReportJob('feedback', department, semester), shared)
+        try:
+            if feedback_data is None:
+                feedback_data = get_class_feedback_data(department, semester)
+            if not feedback_data:
+                job.finish(error="No rating data found for the selected department and semester.")
+                return job
+
+            kwargs = feedback_report_kwargs(department, semester, feedback_data)
+            job.fingerprint = feedback_fingerprint(kwargs)
+            cached = get_cached_feedback_report(department, semester, job.fingerprint)
+            if cached is not None:
+                job.finish(*cached)
+                return job
+
+            from report_generator import generate_feedback_report
+            self._run(job, generate_feedback_report, **kwargs)
+        except Exception as e:
+            logger.error(f"Error queueing feedback report: {e}")
+            job.finish(error=str(e))
+        return job
+
+    def submit_non_submission_report(self, department: str, semester: str,
+                                     shared: bool = False) -> ReportJob:
+        """Queue a non-submission report."""
+        job = self._register(ReportJob('non_submission', department, semester), shared)
+        try:
+            self._run(job, _render_non_submission, department, semester)
+        except Exception as e:
+            logger.error(f"Error queueing non-submission report: {e}")
+            job.finish(error=str(e))
+        return job
+
+    def submit_batch_report(self, fmt: str = 'zip', shared: bool = False) -> ReportJob:
+        """
+        Queue reports for every class with ratings. Both formats render one
+        PDF per class in parallel across the pool; 'zip' archives them and
+        'pdf' concatenates them into a single document (one page per class).
+        """
+        if fmt not in BATCH_FORMATS:
+            raise ValueError(f"Unknown batch format: {fmt}")
+        job = self._register(ReportJob('batch', 'ALL', 'ALL'), shared)
+        job.content_type = 'application/zip' if fmt == 'zip' else 'application/pdf'
+        threading.Thread(target=self._run_batch, args=(job, fmt), daemon=True).start()
+        return job
+
+    def _run_batch(self, job: ReportJob, fmt: str):
+        job.status = 'running'
+        job.save()
+        try:
+            # One pass over rating_aggregates for every class
+            all_feedback_data = get_all_feedback_data()
+            if not all_feedback_data:
+                job.finish(error="No rating data found.")
+                return
+            job.total = len(all_feedback_data)
+            job.save()
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+            # Both formats start from the per-class PDFs, rendered in parallel (or
+            # reused from the report cache)
+            from report_generator import generate_feedback_report, merge_pdfs
+            rendered = {}
+            futures = {}
+            for (department, semester), feedback_data in all_feedback_data.items():
+                kwargs = feedback_report_kwargs(department, semester, feedback_data)
+                fingerprint = feedback_fingerprint(kwargs)
+                cached = get_cached_feedback_report(department, semester, fingerprint)
+                if cached is not None:
+                    rendered[(department, semester)] = cached
+                    job.advance()
+                    continue
+                future = self._executor().submit(generate_feedback_report, **kwargs)
+                futures[future] = (department, semester, fingerprint)
+
+            for future in as_completed(futures):
+                department, semester, fingerprint = futures[future]
+                filename, pdf = future.result()
+                cache_feedback_report(department, semester, fingerprint, filename, pdf)
+                rendered[(department, semester)] = (filename, pdf)
+                job.advance()
+
+            if fmt == 'pdf':
+                # Concatenating pages is cheap next to rendering; still off the web process
+                future = self._executor().submit(merge_pdfs, [rendered[key][1] for key in sorted(rendered)],
+                                                 f"feedback_reports_{stamp}.pdf")
+                job.finish(*future.result())
+                return
+
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for key in sorted(rendered):
+                    filename, pdf = rendered[key]
+                    archive.writestr(filename, pdf)
+            job.finish(f"feedback_reports_{stamp}.zip", buffer.getvalue())
+        except Exception as e:
+            logger.error(f"Batch report job {job.id} failed: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor()
+            job.finish(error=str(e))
+
+    def submit(self, kind: str, department: str = None, semester: str = None, fmt: str = 'zip') -> ReportJob:
+        """Queue a job for polling from any worker (its state goes to the shared store)."""
+        if kind == 'feedback':
+            return self.submit_feedback_report(department, semester, shared=True)
+        if kind == 'non_submission':
+            return self.submit_non_submission_report(department, semester, shared=True)
+        if kind == 'batch':
+            return self.submit_batch_report(fmt, shared=True)
+        raise ValueError(f"Unknown report kind: {kind}")
+
+    def get(self, job_id: str) -> Optional[ReportJob]:
+        """The job if this worker runs it, else its saved state from the shared store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self.store.load(job_id)
+
+    def shutdown(self):
+        self._reset_executor()
+
+report_jobs = ReportJobQueue()
@@ -0,0 +1,169 @@
+"""
+Service for gathering the data behind HOD feedback reports.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.models.storage import get_storage
+from app.services.cache import SizeBoundedCache, TTLCache
+from utils import normalize_semester
+
+logger = logging.getLogger(__name__)
+
+# Rendered feedback PDFs, one per class, keyed by (department, semester)
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+report_cache = SizeBoundedCache(max_bytes=REPORT_CACHE_MAX_BYTES)
+
+# Submission progress is polled by HOD dashboards; a few seconds of staleness is fine
+PROGRESS_CACHE_TTL = float(os.getenv('PROGRESS_CACHE_TTL', '5'))
+
+progress_cache = TTLCache(maxsize=1, ttl=PROGRESS_CACHE_TTL)
+
+def semester_variations(semester: str) -> List[str]:
+    """Semester spellings that may appear in stored rows for the same class."""
+    normalized = normalize_semester(semester)
+    return list(dict.fromkeys([normalized, f"Semester {normalized}", semester.strip()]))
+
+def get_class_rating_summary(department: str, semester: str) -> List[dict]:
+    """
+    Per (staff, subject) averages of q1..q10 and response counts for a class,
+    aggregated by the database.
+    """
+    return get_storage().class_rating_summary(department.strip(), semester_variations(semester))
+
+def get_class_submission_status(department: str, semesters: List[str]) -> dict:
+    """
+    Submission counts and the non-submitted students for a class, computed by
+    the database so only the class's own rows are transferred.
+
+    Returns:
+        Dict with total_students, submitted_count and non_submitted (list of
+        registerno/department/semester dicts ordered by register number)
+    """
+    row = get_storage().class_non_submissions(department.strip(), semesters)
+    return {
+        'total_students': row.get('total_students') or 0,
+        'submitted_count': row.get('submitted_count') or 0,
+        'non_submitted': row.get('non_submitted') or []
+    }
+
+def _load_progress() -> List[dict]:
+    # Merge semester spellings of the same class
+    classes = defaultdict(lambda: [0, 0])
+    for row in get_storage().batch_ranges():
+        counts = classes[report_cache_key(row['department'], row['semester'])]
+        counts[0] += row['student_count'] or 0
+        counts[1] += row['submitted_count'] or 0
+
+    progress = []
+    for (department, semester), (total, submitted) in sorted(classes.items()):
+        submitted = min(submitted, total)
+        progress.append({
+            'department': department,
+            'semester': semester,
+            'total': total,
+            'submitted': submitted,
+            'pending': total - submitted,
+            'percent': round(submitted * 100.0 / total, 1) if total else 0.0
+        })
+    return progress
+
+def get_submission_progress(department: str = None, semester: str = None) -> List[dict]:
+    """
+    Submitted/total counts per class from the incrementally maintained
+    student_batch_ranges counters. One small table read, cached for
+    PROGRESS_CACHE_TTL seconds across all callers.
+    """
+    progress = progress_cache.get('all')
+    if progress is None:
+        progress = _load_progress()
+        progress_cache.set('all', progress)
+
+    if department:
+        progress = [row for row in progress if row['department'] == department.strip()]
+    if semester:
+        progress = [row for row in progress if row['semester'] == normalize_semester(semester)]
+    return progress
+
+def build_feedback_data(summary_rows: List[dict]) -> Dict[str, dict]:
+    """Turn summary rows into the feedback_data structure used by report_generator."""
+    feedback_data = {}
+    for staff_counter, row in enumerate(summary_rows, start=1):
+        staff_name = row['staff'].strip()
+        subject_name = row['subject'].strip()
+        scores = [row[f'q{i}_avg'] or 0 for i in range(1, 11)]
+
+        key = f"{staff_name}_{subject_name}"
+        feedback_data[key] = {
+            'reference': f'S{staff_counter}',
+            'staff_name': staff_name,
+            'subject': subject_name,
+            'scores': scores
+        }
+    return feedback_data
+
+def get_class_feedback_data(department: str, semester: str) -> Dict[str, dict]:
+    """Report data for one department and semester."""
+    return build_feedback_data(get_class_rating_summary(department, semester))
+
+def get_all_feedback_data() -> Dict[Tuple[str, str], Dict[str, dict]]:
+    """
+    Report data for every class with ratings, read in a single pass over
+    rating_aggregates. Keys are (department, normalized semester).
+    """
+    from app.services.rating_aggregates import get_rating_aggregates, merge_aggregates, question_mean
+
+    classes = defaultdict(list)
+    for row in get_rating_aggregates():
+        classes[report_cache_key(row['department'], row['semester'])].append(row)
+
+    all_feedback_data = {}
+    for key, rows in sorted(classes.items()):
+        summary_rows = [
+            dict(staff=row['staff'], subject=row['subject'],
+                 **{f'q{i}_avg': question_mean(row, i) for i in range(1, 11)})
+            for row in merge_aggregates(rows) if row['response_count']
+        ]
+        if summary_rows:
+            all_feedback_data[key] = build_feedback_data(summary_rows)
+    return all_feedback_data
+
+def report_cache_key(department: str, semester: str) -> Tuple[str, str]:
+    return (department.strip(), normalize_semester(semester))
+
+def feedback_fingerprint(report_kwargs: dict) -> str:
+    """
+    Hash of everything that ends up in a rendered feedback report: the
+    feedback_report_kwargs() dict, including the branch and semester strings
+    exactly as printed (the cache key normalizes the semester, the PDF does not).
+    """
+    payload = json.dumps(report_kwargs, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def feedback_report_kwargs(department: str, semester: str, feedback_data: Dict[str, dict]) -> dict:
+    """Arguments for report_generator.generate_feedback_report for one class."""
+    year = (int(normalize_semester(semester)) + 1) // 2
+    return {
+        'academic_year': str(datetime.now().year),
+        'branch': department,
+        'semester': semester,
+        'year': str(year),
+        'feedback_data': feedback_data
+    }
+
+def get_cached_feedback_report(department: str, semester: str, fingerprint: str) -> Optional[Tuple[str, bytes]]:
+    """Cached (filename, pdf_bytes) for a class if it was rendered from the same data."""
+    cached = report_cache.get(report_cache_key(department, semester))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1], cached[2]
+    return None
+
+def cache_feedback_report(department: str, semester: str, fingerprint: str, filename: str, pdf_content: bytes):
+    # A class keeps a single entry; new ratings replace the stale render
+    report_cache.set(report_cache_key(department, semester), (fingerprint, filename, pdf_content), len(pdf_content))
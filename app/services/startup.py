@@ -0,0 +1,89 @@
+"""
+Per-worker warm-up and shutdown.
+
+Each uvicorn worker is a separate process with its own Supabase clients and
+caches. Building them lazily makes the first requests a worker serves pay for
+client construction, TLS handshakes, registry loading and template
+compilation. warm_up() and warm_up_async() do that work in the ASGI lifespan
+startup, before the worker accepts traffic, and health-check the clients so a
+worker that cannot reach the database says so in the log at boot.
+
+Every step is independent: a failure is logged and the step is left to
+happen lazily on first use, as before.
+"""
+
+import os
+import time
+import logging
+from typing import Dict
+from app.models.storage import get_storage
+from app.models.async_storage import get_async_storage
+from app.models.supabase_db import reset_supabase_client, reset_async_supabase_client
+from app.models.submissions import submission_registry
+from app.services.reference_data import REFERENCE_TABLES, get_reference_list
+
+logger = logging.getLogger(__name__)
+
+# Templates rendered on the student hot path
+WARM_TEMPLATES = ('student_login.html', 'feedback.html')
+
+def _timed(steps: Dict[str, str], name: str, fn) -> bool:
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        steps[name] = f"failed: {e}"
+        logger.error(f"Warm-up step '{name}' failed: {e}")
+        return False
+    steps[name] = f"{(time.perf_counter() - started) * 1000:.0f} ms"
+    return True
+
+def warm_up(flask_app=None) -> Dict[str, str]:
+    """
+    Create and health-check the storage client, then preload the submission
+    registry, reference lists and student templates.
+
+    Returns:
+        Dict of step name to duration or failure message
+    """
+    steps = {}
+    storage = get_storage()
+
+    if not _timed(steps, 'storage', storage.ping):
+        if storage.name == 'supabase':
+            reset_supabase_client()
+        # Nothing below can load without the database
+        logger.warning(f"Worker {os.getpid()} warm-up skipped preloading: {steps}")
+        return steps
+
+    _timed(steps, 'submission_registry', submission_registry.warm)
+    for table in REFERENCE_TABLES:
+        _timed(steps, table, lambda: get_reference_list(table))
+    if flask_app is not None:
+        for template in WARM_TEMPLATES:
+            _timed(steps, template, lambda: flask_app.jinja_env.get_template(template))
+
+    logger.info(f"Worker {os.getpid()} warm-up: {steps}")
+    return steps
+
+async def warm_up_async() -> Dict[str, str]:
+    """Create and health-check the async client used by the student routes."""
+    steps = {}
+    started = time.perf_counter()
+    storage = get_async_storage()
+    try:
+        await storage.ping()
+    except Exception as e:
+        steps['async_storage'] = f"failed: {e}"
+        logger.error(f"Warm-up step 'async_storage' failed: {e}")
+        if storage.name == 'supabase':
+            reset_async_supabase_client()
+        return steps
+    steps['async_storage'] = f"{(time.perf_counter() - started) * 1000:.0f} ms"
+    logger.info(f"Worker {os.getpid()} async warm-up: {steps}")
+    return steps
+
+def shutdown():
+    """Release per-worker resources (the report rendering pool)."""
+    from app.services.report_jobs import report_jobs
+    report_jobs.shutdown()
@@ -0,0 +1,102 @@
+"""
+Offline benchmark: single-round-trip login lookup vs the legacy three-query path.
+
+Seeds a local SQLite stand-in with a college-sized student table and times both
+login paths. --rtt-ms adds a simulated network round trip per query so the
+numbers approximate a remote Supabase instance.
+
+Usage: python benchmarks/login_lookup.py [--classes 40] [--class-size 60] [--logins 600] [--rtt-ms 0]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import sqlite_db
+
+
+def seed(conn, classes, class_size):
+    """Insert `classes` department/semester groups of `class_size` students."""
+    regnos = []
+    base = 922500000000
+    for c in range(classes):
+        department = f"Department {c // 4}"
+        semester = str((c % 4) * 2 + 2)
+        for i in range(class_size):
+            regno = str(base + c * 1000 + i)
+            regnos.append(regno)
+            conn.execute(
+                "INSERT INTO students (registerno, department, semester) VALUES (?, ?, ?)",
+                (regno, department, semester)
+            )
+        sqlite_db.refresh_batch_range(conn, department, semester)
+    # Roughly a third of the college has already submitted
+    for regno in random.sample(regnos, len(regnos) // 3):
+        conn.execute("INSERT INTO submitted_feedback (registerno) VALUES (?)", (regno,))
+    conn.commit()
+    return regnos
+
+
+def legacy_login(conn, registerno, rtt):
+    """The old path: student lookup, full class scan, submission check."""
+    time.sleep(rtt)
+    student = conn.execute(
+        "SELECT registerno, department, semester FROM students WHERE registerno = ?",
+        (registerno,)
+    ).fetchone()
+    if student is None:
+        return None
+
+    time.sleep(rtt)
+    rows = conn.execute(
+        "SELECT registerno FROM students WHERE department = ? AND semester = ?",
+        (student['department'], student['semester'])
+    ).fetchall()
+    reg_nums = [int(row['registerno']) for row in rows]
+    min_reg, max_reg = min(reg_nums), max(reg_nums)
+
+    time.sleep(rtt)
+    submitted = conn.execute(
+        "SELECT id FROM submitted_feedback WHERE registerno = ?", (registerno,)
+    ).fetchone() is not None
+    return submitted, min_reg, max_reg
+
+
+def single_login(conn, registerno, rtt):
+    """The new path: one login_lookup call."""
+    time.sleep(rtt)
+    return sqlite_db.login_lookup(conn, registerno)
+
+
+def run(label, fn, conn, regnos, rtt):
+    start = time.perf_counter()
+    for regno in regnos:
+        fn(conn, regno, rtt)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {len(regnos)} logins in {elapsed:.3f}s "
+          f"({elapsed / len(regnos) * 1000:.3f} ms/login)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--classes', type=int, default=40)
+    parser.add_argument('--class-size', type=int, default=60)
+    parser.add_argument('--logins', type=int, default=600)
+    parser.add_argument('--rtt-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    conn = sqlite_db.connect()
+    regnos = seed(conn, args.classes, args.class_size)
+    sample = random.choices(regnos, k=args.logins)
+    rtt = args.rtt_ms / 1000.0
+
+    run('legacy', legacy_login, conn, sample, rtt)
+    run('single', single_login, conn, sample, rtt)
+
+
+if __name__ == '__main__':
+    main()
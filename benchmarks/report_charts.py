@@ -0,0 +1,76 @@
+"""
+Offline benchmark: ReportLab vector chart vs matplotlib PNG for feedback reports.
+
+Builds synthetic feedback_data for one class and times the score graph on its
+own and the full in-memory report for each chart backend. The matplotlib
+backend is timed at every --dpi value given.
+
+Usage: python benchmarks/report_charts.py [--staff 8] [--runs 20] [--dpi 300 150 100]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+
+import report_generator
+
+
+def make_feedback_data(staff_count):
+    feedback_data = {}
+    for i in range(1, staff_count + 1):
+        feedback_data[f"Staff {i}_Subject {i}"] = {
+            'reference': f'S{i}',
+            'staff_name': f'Staff {i}',
+            'subject': f'Subject {i}',
+            'scores': [round(random.uniform(5, 10), 2) for _ in range(10)]
+        }
+    return feedback_data
+
+
+def time_runs(fn, runs):
+    fn()  # warm-up: font loading, figure creation
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn()
+    return (time.perf_counter() - start) / runs * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--staff', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--dpi', type=int, nargs='+', default=[300, 150, 100])
+    args = parser.parse_args()
+
+    feedback_data = make_feedback_data(args.staff)
+    width, height = A4[0] - 50, 2.5 * inch
+
+    cases = [('reportlab', None)] + [('matplotlib', dpi) for dpi in args.dpi]
+    print(f"{'backend':<18} {'chart ms':>10} {'report ms':>10} {'pdf KB':>8}")
+    for backend, dpi in cases:
+        if dpi is not None:
+            report_generator.CHART_DPI = dpi
+        label = backend if dpi is None else f"{backend}@{dpi}"
+
+        chart_ms, _ = time_runs(
+            lambda: report_generator.score_graph_flowable(feedback_data, width, height, backend),
+            args.runs
+        )
+        report_ms, (_, pdf_bytes) = time_runs(
+            lambda: report_generator.generate_feedback_report(
+                '2025', 'Benchmark Department', '4', '2', feedback_data, chart_backend=backend
+            ),
+            args.runs
+        )
+        print(f"{label:<18} {chart_ms:>10.2f} {report_ms:>10.2f} {len(pdf_bytes) / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,16 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Database configuration
-DATABASE_PATH = 'data/feedback.db'
+# STORAGE_BACKEND: 'supabase' (default) or 'sqlite' for a local database file
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase').strip().lower()
+DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join('data', 'feedback.db'))
+
+# Serve '/', '/validate_regno' and '/feedback' from the async ASGI routes
+# (routes/student_async.py); set to 0 to serve everything through Flask
+ASYNC_STUDENT_ROUTES = os.getenv('ASYNC_STUDENT_ROUTES', '1').strip().lower() not in ('0', 'false', 'no')
 
 # File paths (kept for backward compatibility during migration)
 DEPARTMENTS_FILE = 'departments.csv'
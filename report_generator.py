@@ -2,7 +2,12 @@ import os
 import io
 import sys
 import logging
-import matplotlib.pyplot as plt
+import threading
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from pypdf import PdfWriter
+from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.charts.barcharts import VerticalBarChart
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -37,11 +42,19 @@ class CustomDocTemplate(SimpleDocTemplate):
             # Handle the case when frame is not provided
             return SimpleDocTemplate.handle_frameBegin(self, **kwargs)
 
-def create_score_graph(feedback_data):
-    """
-    Create a bar graph image for the feedback data.
-    """
-    # Prepare data
+# Chart backend for the score graph: 'reportlab' draws vector bars directly
+# into the PDF; 'matplotlib' embeds a PNG rendered at REPORT_CHART_DPI
+CHART_BACKEND = os.getenv('REPORT_CHART_BACKEND', 'reportlab').strip().lower()
+CHART_DPI = int(os.getenv('REPORT_CHART_DPI', '150'))
+CHART_BACKENDS = ('reportlab', 'matplotlib')
+
+BAR_COLOR = '#007bff'
+
+# One matplotlib figure per thread, cleared and reused for every report
+_figures = threading.local()
+
+def score_totals(feedback_data):
+    """Chart labels and total scores (out of 100) for each staff/subject."""
     references = []
     totals = []
     for data in feedback_data.values():
@@ -49,20 +62,36 @@ def create_score_graph(feedback_data):
         references.append(ref)
         # Calculate total score out of 100
         totals.append((sum(data['scores']) / 10) * 10)
+    return references, totals
+
+def _reusable_figure():
+    fig = getattr(_figures, 'figure', None)
+    if fig is None:
+        # Figure + Agg canvas directly, so no pyplot global state is involved
+        fig = Figure(figsize=(10, 4))
+        FigureCanvasAgg(fig)
+        _figures.figure = fig
+    else:
+        fig.clear()
+    return fig
+
+def create_score_graph(feedback_data, dpi=None):
+    """
+    Create a bar graph image (PNG buffer) for the feedback data with matplotlib.
+    """
+    references, totals = score_totals(feedback_data)
+    dpi = dpi or CHART_DPI
     
-    # Create the plot with optimal dimensions
-    plt.rcParams['figure.dpi'] = 300
-    fig, ax = plt.subplots(figsize=(10, 4))
-    bars = ax.bar(references, totals, color='#007bff')
+    fig = _reusable_figure()
+    ax = fig.add_subplot(111)
+    bars = ax.bar(references, totals, color=BAR_COLOR)
     
     # Remove axis labels, keep only the grid and ticks
     ax.set_xlabel('')
     ax.set_ylabel('')
     ax.set_title('')
     ax.set_ylim(0, 100)
-    
-    plt.xticks(fontsize=9)
-    plt.yticks(fontsize=9)
+    ax.tick_params(axis='both', labelsize=9)
     
     # Add value labels on top of each bar
     for bar, total in zip(bars, totals):
@@ -74,15 +103,66 @@ def create_score_graph(feedback_data):
     
     # Add grid for better readability
     ax.grid(True, axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
+    fig.tight_layout()
     
     # Save to buffer
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', dpi=300)
-    plt.close(fig)
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
     buf.seek(0)
     return buf
 
+def create_score_chart(feedback_data, width, height):
+    """
+    Create the same bar graph as a ReportLab vector drawing (no rasterising).
+    """
+    references, totals = score_totals(feedback_data)
+    
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x = 30
+    chart.y = 20
+    chart.width = width - 40
+    chart.height = height - 35
+    chart.data = [totals or [0]]
+    chart.bars[0].fillColor = colors.HexColor(BAR_COLOR)
+    chart.bars[0].strokeColor = None
+    chart.barSpacing = 2
+    chart.groupSpacing = 10
+    
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = 100
+    chart.valueAxis.valueStep = 20
+    chart.valueAxis.labels.fontSize = 8
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = colors.lightgrey
+    chart.valueAxis.gridStrokeDashArray = (2, 2)
+    
+    chart.categoryAxis.categoryNames = references or ['']
+    chart.categoryAxis.labels.fontSize = 8
+    chart.categoryAxis.labels.dy = -2
+    
+    # Value labels on top of each bar
+    chart.barLabelFormat = '%.1f'
+    chart.barLabels.fontSize = 7
+    chart.barLabels.nudge = 6
+    
+    drawing.add(chart)
+    return drawing
+
+def score_graph_flowable(feedback_data, width, height, backend=None):
+    """Score graph as a flowable for the selected chart backend."""
+    backend = (backend or CHART_BACKEND).lower()
+    if backend not in CHART_BACKENDS:
+        raise ValueError(f"Unknown chart backend: {backend}")
+    
+    if backend == 'reportlab':
+        return create_score_chart(feedback_data, width, height)
+    
+    img = Image(create_score_graph(feedback_data))
+    img.drawWidth = width
+    img.drawHeight = height
+    return img
+
 class FooterCanvas:
     def __init__(self, canvas, doc):
         self.canvas = canvas
@@ -110,15 +190,10 @@ class FooterCanvas:
         self.canvas.restoreState()
 
 
-def generate_feedback_report(academic_year, branch, semester, year, feedback_data):
-    """Generate a single-page PDF report with prominent graph."""
-    filename = f"{branch}_Semester {semester}.pdf"
-    filepath = os.path.abspath(filename)
-    logger.info(f"Generating report: {filename}")
-    
+def _new_document(buffer):
     # Create a CustomDocTemplate
-    doc = CustomDocTemplate(
-        filename,
+    return CustomDocTemplate(
+        buffer,
         pagesize=A4,
         rightMargin=20,
         leftMargin=20,
@@ -126,6 +201,11 @@ def generate_feedback_report(academic_year, branch, semester, year, feedback_dat
         bottomMargin=40  # Increased bottom margin for watermark
     )
 
+def _footer_func(canvas, doc):
+    FooterCanvas(canvas, doc).draw_footer()
+
+def build_feedback_elements(doc, academic_year, branch, semester, year, feedback_data, chart_backend=None):
+    """Flowables for one class's feedback report page."""
     styles = getSampleStyleSheet()
     
     title_style = ParagraphStyle(
@@ -222,11 +302,7 @@ def generate_feedback_report(academic_year, branch, semester, year, feedback_dat
     elements.append(Spacer(1, 5))
 
     # Add graph
-    graph_buffer = create_score_graph(feedback_data)
-    img = Image(graph_buffer)
-    img.drawWidth = A4[0] - 50
-    img.drawHeight = 2.5 * inch
-    elements.append(img)
+    elements.append(score_graph_flowable(feedback_data, A4[0] - 50, 2.5 * inch, chart_backend))
     elements.append(Spacer(1, 5))
 
     # Add references
@@ -276,19 +352,43 @@ def generate_feedback_report(academic_year, branch, semester, year, feedback_dat
     )
     elements.append(signature_table)
     
+    return elements
+
+def generate_feedback_report(academic_year, branch, semester, year, feedback_data, chart_backend=None):
+    """
+    Generate a single-page PDF report with prominent graph.
+    The PDF is built in memory; nothing is written to the working directory.
+    chart_backend overrides REPORT_CHART_BACKEND ('reportlab' or 'matplotlib').
+    Returns: (filename, pdf_bytes)
+    """
+    filename = f"{branch}_Semester {semester}.pdf"
+    logger.info(f"Generating report: {filename}")
+    buffer = io.BytesIO()
+    doc = _new_document(buffer)
+    elements = build_feedback_elements(doc, academic_year, branch, semester, year, feedback_data, chart_backend)
+    
     try:
-        # Add the footer to each page
-        def footer_func(canvas, doc):
-            FooterCanvas(canvas, doc).draw_footer()
-            
-        # Build the document with the footer function
-        doc.build(elements, onFirstPage=footer_func, onLaterPages=footer_func)
-        logger.info(f"Report saved: {filepath}")
-        return filepath
+        # Build the document with the footer on every page
+        doc.build(elements, onFirstPage=_footer_func, onLaterPages=_footer_func)
+        logger.info(f"Report generated: {filename}")
+        return filename, buffer.getvalue()
     except Exception as e:
         logger.error(f"PDF generation failed: {str(e)}")
         raise
 
+def merge_pdfs(pdfs, filename="feedback_reports.pdf"):
+    """
+    Concatenate rendered PDFs (e.g. generate_feedback_report output) into one document.
+    Returns: (filename, pdf_bytes)
+    """
+    logger.info(f"Merging {len(pdfs)} reports into {filename}")
+    writer = PdfWriter()
+    for pdf in pdfs:
+        writer.append(io.BytesIO(pdf))
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return filename, buffer.getvalue()
+
 if __name__ == "__main__":
     department = "Computer Science and Business Systems"
     semester = 4
@@ -312,11 +412,13 @@ if __name__ == "__main__":
     
     feedback_data = read_feedback_data(department, semester)
     
-    filepath = generate_feedback_report(
+    filename, pdf_bytes = generate_feedback_report(
         academic_year="2024-25",
         branch=department,
         semester=semester,
         year="II",
         feedback_data=feedback_data
     )
-    logger.info(f"Report ready: {filepath}")
+    with open(filename, 'wb') as f:
+        f.write(pdf_bytes)
+    logger.info(f"Report ready: {os.path.abspath(filename)}")
@@ -1,4 +1,5 @@
 import csv
+import io
 import os
 import logging
 from reportlab.lib import colors
@@ -7,7 +8,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.pdfgen import canvas
 from datetime import datetime
-from app.models.database import get_db
+from app.services.report_service import get_class_submission_status
 
 # Configure logging
 logging.basicConfig(
@@ -45,6 +46,10 @@ def generate_non_submission_report(department, semester):
     Args:
         department (str): The department to filter by (e.g., "Computer Science and Engineering -A")
         semester (str): The semester to filter by (e.g., "2", "4", "6")
+    
+    Returns:
+        Tuple of (filename, pdf_bytes), or None if the data could not be read.
+        The PDF is built in memory.
     """
     # Normalize inputs
     department = normalize_department_name(department)
@@ -52,79 +57,33 @@ def generate_non_submission_report(department, semester):
     
     logging.info(f"Processing feedback submissions for '{department}' - Semester '{semester}'")
     
-    # Get submitted register numbers from database
-    submitted_regnos = set()
-    logging.info("Reading submitted feedback from database...")
-    
-    try:
-        client = get_db()
-        # Get all submitted registration numbers
-        result = client.table('submitted_feedback').select('registerno').execute()
-        for row in result.data:
-            submitted_regnos.add(row['registerno'].strip())
-        
-        logging.info(f"Found {len(submitted_regnos)} total submissions in database")
-    
-    except Exception as e:
-        logging.error(f"Error reading submitted feedback: {e}")
-        return None
-    
-    # Get all students from the specified department and semester
-    logging.info("Reading students from database...")
-    all_students = []
+    # Try multiple semester formats since data might be inconsistent
+    sem_variations = [
+        semester,
+        f"Semester {semester}",
+        f"semester {semester}"
+    ]
     
+    # The database anti-joins the class against submitted_feedback, so only
+    # this class's students are transferred
     try:
-        client = get_db()
-        # Try multiple semester formats since data might be inconsistent
-        sem_variations = [
-            semester,
-            f"Semester {semester}",
-            f"semester {semester}"
-        ]
-        result = client.table('students')\
-            .select('registerno, department, semester')\
-            .eq('department', department.strip())\
-            .in_('semester', sem_variations)\
-            .execute()
-        
-        student_count = 0
-        for row in result.data:
-            current_regno = row['registerno'].strip()
-            student_info = {
-                'registerno': current_regno,
-                'department': row['department'],
-                'semester': row['semester']
-            }
-            all_students.append(student_info)
-            student_count += 1
-            logging.debug(f"Found student: {current_regno}")
-        
-        logging.info(f"Found {student_count} students in {department} semester {semester}")
-    
+        status = get_class_submission_status(department, sem_variations)
     except Exception as e:
-        logging.error(f"Error reading students: {e}")
+        logging.error(f"Error reading submission status: {e}")
         return None
     
-    logging.info("Checking for non-submissions...")
-    
-    # Find students who haven't submitted
-    non_submitted = []
-    for student in all_students:
-        regno = student['registerno']
-        if regno not in submitted_regnos:
-            non_submitted.append(student)
-            logging.debug(f"Non-submission found: {regno}")
-        else:
-            logging.debug(f"Submission verified for: {regno}")
+    non_submitted = status['non_submitted']
+    total = status['total_students']
+    submitted = status['submitted_count']
     
-    logging.info(f"Total students: {len(all_students)}")
-    logging.info(f"Total submissions: {len(submitted_regnos)}")
+    logging.info(f"Total students: {total}")
+    logging.info(f"Submitted: {submitted}")
     logging.info(f"Non-submissions: {len(non_submitted)}")
     
     # Generate PDF report
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"non_submission_report_{department.replace(' ', '_')}_{semester}_{timestamp}.pdf"
-    pdf_path = os.path.join(os.getcwd(), filename)
+    buffer = io.BytesIO()
     
     def add_watermark(canvas, doc):
         canvas.saveState()
@@ -146,7 +105,7 @@ def generate_non_submission_report(department, semester):
         canvas.restoreState()
 
     doc = SimpleDocTemplate(
-        pdf_path,
+        buffer,
         pagesize=letter,
         rightMargin=36,
         leftMargin=36,
@@ -198,9 +157,7 @@ def generate_non_submission_report(department, semester):
     content.append(Spacer(1, 24))
     
     # Statistics
-    total = len(all_students)
     not_submitted = len(non_submitted)
-    submitted = total - not_submitted
     stats = Paragraph(
         f"Total Students: {total} | Submitted: {submitted} | Not Submitted: {not_submitted}",
         styles['Normal']
@@ -238,4 +195,4 @@ def generate_non_submission_report(department, semester):
     # Generate PDF
     doc.build(content)
     logging.info(f"Report generated: {filename}")
-    return pdf_path
+    return filename, buffer.getvalue()
@@ -2,12 +2,15 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from werkzeug.utils import secure_filename
 import os
 import logging
-from app.models.database import get_db
+from app.models.storage import get_storage
 from app.models.student import Student
 from app.services.excel_service import process_student_excel, create_sample_excel
 from app.services.mapping_service import (
     process_mapping_excel, create_sample_mapping_excel,
-    bulk_add_staff, bulk_add_subjects
+    bulk_add_staff, bulk_add_subjects, invalidate_mapping_cache
+)
+from app.services.reference_data import (
+    get_reference_list, get_reference_lists, reference_validators, invalidate_reference_data
 )
 from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, MAX_FILE_SIZE
 from utils import normalize_regno
@@ -41,16 +44,8 @@ def admin_dashboard():
 @admin_bp.route('/admin/students', methods=['GET'])
 def admin_students():
     """Display the student management page."""
-    client = get_db()
-    
     try:
-        # Get departments from departments table
-        dept_result = client.table('departments').select('name').order('name').execute()
-        departments = [row['name'] for row in dept_result.data]
-        
-        # Get semesters from semesters table
-        sem_result = client.table('semesters').select('name').order('name').execute()
-        semesters = [row['name'] for row in sem_result.data]
+        departments, semesters = get_reference_lists('departments', 'semesters')
     except Exception as e:
         logger.error(f"Error loading student management data: {e}")
         departments = []
@@ -287,9 +282,10 @@ def delete_multiple_students():
                 'message': 'No students selected for deletion'
             })
         
-        client = get_db()
+        storage = get_storage()
         deleted_count = 0
         errors = []
+        affected_groups = set()
         
         for student in students:
             try:
@@ -298,18 +294,15 @@ def delete_multiple_students():
                 semester = student.get('semester', '').strip()
                 
                 # Delete student
-                result = client.table('students')\
-                    .delete()\
-                    .eq('registerno', registerno)\
-                    .eq('department', department)\
-                    .eq('semester', semester)\
-                    .execute()
-                
-                if result.data:
+                if storage.delete_student(registerno, department, semester):
                     deleted_count += 1
+                    affected_groups.add((department, semester))
             except Exception as e:
                 errors.append(f"Error deleting {student.get('registerno')}: {str(e)}")
         
+        for department, semester in affected_groups:
+            Student.refresh_batch_range(department, semester)
+        
         if deleted_count > 0:
             message = f'Successfully deleted {deleted_count} students.'
             if errors:
@@ -340,9 +333,7 @@ def download_department_names():
         import csv
         import io
         
-        client = get_db()
-        dept_result = client.table('departments').select('name').order('name').execute()
-        departments = [row['name'] for row in dept_result.data]
+        departments = get_reference_list('departments')
         
         # Create CSV in memory
         output = io.StringIO()
@@ -374,9 +365,7 @@ def download_semester_names():
         import csv
         import io
         
-        client = get_db()
-        sem_result = client.table('semesters').select('name').order('name').execute()
-        semesters = [row['name'] for row in sem_result.data]
+        semesters = get_reference_list('semesters')
         
         # Create CSV in memory
         output = io.StringIO()
@@ -408,23 +397,9 @@ def download_reference_file():
         import openpyxl
         from openpyxl.styles import Font, PatternFill, Alignment
         
-        client = get_db()
-        
-        # Get departments
-        dept_result = client.table('departments').select('name').order('name').execute()
-        departments = [row['name'] for row in dept_result.data]
-        
-        # Get semesters
-        sem_result = client.table('semesters').select('name').order('name').execute()
-        semesters = [row['name'] for row in sem_result.data]
-        
-        # Get staff
-        staff_result = client.table('staff').select('name').order('name').execute()
-        staffs = [row['name'] for row in staff_result.data]
-        
-        # Get subjects
-        subj_result = client.table('subjects').select('name').order('name').execute()
-        subjects = [row['name'] for row in subj_result.data]
+        departments, semesters, staffs, subjects = get_reference_lists(
+            'departments', 'semesters', 'staff', 'subjects'
+        )
         
         # Create Excel workbook
         wb = openpyxl.Workbook()
@@ -486,24 +461,12 @@ def download_reference_file():
 @admin_bp.route('/admin', methods=['GET', 'POST'])
 def admin():
     """Admin mapping page."""
-    client = get_db()
+    storage = get_storage()
     
     try:
-        # Get departments
-        dept_result = client.table('departments').select('name').order('name').execute()
-        departments = [row['name'] for row in dept_result.data]
-        
-        # Get semesters
-        sem_result = client.table('semesters').select('name').order('name').execute()
-        semesters = [row['name'] for row in sem_result.data]
-        
-        # Get staff
-        staff_result = client.table('staff').select('name').order('name').execute()
-        staffs = [row['name'] for row in staff_result.data]
-        
-        # Get subjects
-        subj_result = client.table('subjects').select('name').order('name').execute()
-        subjects = [row['name'] for row in subj_result.data]
+        departments, semesters, staffs, subjects = get_reference_lists(
+            'departments', 'semesters', 'staff', 'subjects'
+        )
     except Exception as e:
         logger.error(f"Error loading admin page data: {e}")
         departments = []
@@ -528,14 +491,11 @@ def admin():
         else:
             try:
                 # Delete existing mappings for this dept/semester
-                client.table('admin_mappings')\
-                    .delete()\
-                    .eq('department', department)\
-                    .eq('semester', semester)\
-                    .execute()
+                storage.delete_mappings(department, semester)
                 
                 # Insert new mappings
-                client.table('admin_mappings').insert(new_mappings).execute()
+                storage.insert_mappings(new_mappings)
+                invalidate_mapping_cache(department, semester)
                 
                 flash("Mapping(s) saved successfully.", "success")
             except Exception as e:
@@ -561,19 +521,18 @@ def add_staff():
                 'message': 'Staff name cannot be empty'
             })
         
-        client = get_db()
+        storage = get_storage()
         
         # Check if staff already exists
-        existing = client.table('staff').select('name').eq('name', staff_name).execute()
-        
-        if existing.data:
+        if storage.existing_reference_names('staff', [staff_name]):
             return jsonify({
                 'success': False,
                 'message': 'Staff name already exists'
             })
         
         # Insert new staff
-        client.table('staff').insert({'name': staff_name}).execute()
+        storage.insert_reference_names('staff', [staff_name])
+        invalidate_reference_data('staff')
         
         return jsonify({
             'success': True,
@@ -599,19 +558,18 @@ def add_subject():
                 'message': 'Subject name cannot be empty'
             })
         
-        client = get_db()
+        storage = get_storage()
         
         # Check if subject already exists
-        existing = client.table('subjects').select('name').eq('name', subject_name).execute()
-        
-        if existing.data:
+        if storage.existing_reference_names('subjects', [subject_name]):
             return jsonify({
                 'success': False,
                 'message': 'Subject already exists'
             })
         
         # Insert new subject
-        client.table('subjects').insert({'name': subject_name}).execute()
+        storage.insert_reference_names('subjects', [subject_name])
+        invalidate_reference_data('subjects')
         
         return jsonify({
             'success': True,
@@ -628,23 +586,20 @@ def add_subject():
 
 @admin_bp.route('/admin/get_lists', methods=['GET'])
 def get_lists():
-    """Get staff and subject lists."""
+    """Get staff and subject lists (answers 304 when the client copy is current)."""
     try:
-        client = get_db()
+        staffs, subjects = get_reference_lists('staff', 'subjects')
+        etag, last_modified = reference_validators('staff', 'subjects')
         
-        # Get staff list
-        staff_result = client.table('staff').select('name').order('name').execute()
-        staffs = [row['name'] for row in staff_result.data]
-        
-        # Get subjects list
-        subj_result = client.table('subjects').select('name').order('name').execute()
-        subjects = [row['name'] for row in subj_result.data]
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
             'staffs': staffs,
             'subjects': subjects
         })
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Error getting lists: {e}")
         return jsonify({
@@ -655,16 +610,8 @@ def get_lists():
 @admin_bp.route('/admin/mappings/view', methods=['GET'])
 def view_mappings():
     """View all staff-subject mappings."""
-    client = get_db()
-    
     try:
-        # Get departments for filtering
-        dept_result = client.table('departments').select('name').order('name').execute()
-        departments = [row['name'] for row in dept_result.data]
-        
-        # Get semesters for filtering
-        sem_result = client.table('semesters').select('name').order('name').execute()
-        semesters = [row['name'] for row in sem_result.data]
+        departments, semesters = get_reference_lists('departments', 'semesters')
     except Exception as e:
         logger.error(f"Error loading mappings view data: {e}")
         departments = []
@@ -681,24 +628,9 @@ def list_mappings():
     semester = request.args.get('semester', '').strip()
     
     try:
-        client = get_db()
-        query = client.table('admin_mappings').select('id, department, semester, staff, subject')
-        
-        if department and semester:
-            query = query.eq('department', department).eq('semester', semester)
-            query = query.order('staff').order('subject')
-        elif department:
-            query = query.eq('department', department)
-            query = query.order('semester').order('staff').order('subject')
-        elif semester:
-            query = query.eq('semester', semester)
-            query = query.order('department').order('staff').order('subject')
-        else:
-            query = query.order('department').order('semester').order('staff').order('subject')
-            query = query.limit(500)
-        
-        result = query.execute()
-        mappings = result.data
+        # Unfiltered listings are capped at 500 rows
+        mappings = get_storage().find_mappings(department or None, semester or None,
+                                               limit=None if department or semester else 500)
         
         return jsonify({
             'success': True,
@@ -724,10 +656,10 @@ def delete_mapping():
                 'message': 'Mapping ID is required'
             })
         
-        client = get_db()
-        result = client.table('admin_mappings').delete().eq('id', mapping_id).execute()
+        deleted = get_storage().delete_mapping(mapping_id)
         
-        if result.data:
+        if deleted:
+            invalidate_mapping_cache(deleted['department'], deleted['semester'])
             return jsonify({
                 'success': True,
                 'message': 'Mapping deleted successfully'
@@ -758,14 +690,8 @@ def delete_all_mappings():
                 'message': 'Department and semester are required'
             })
         
-        client = get_db()
-        result = client.table('admin_mappings')\
-            .delete()\
-            .eq('department', department)\
-            .eq('semester', semester)\
-            .execute()
-        
-        deleted_count = len(result.data) if result.data else 0
+        deleted_count = get_storage().delete_mappings(department, semester)
+        invalidate_mapping_cache(department, semester)
         
         return jsonify({
             'success': True,
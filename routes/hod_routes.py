@@ -1,14 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, make_response, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, make_response, current_app, jsonify
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from utils import read_csv_as_list, update_mainratings, normalize_semester
+from utils import read_csv_as_list
 from config import (DEPARTMENTS_FILE, SEMESTERS_FILE, MAINRATING_FILE,
                    RATING_FILE, STUDENT_FILE, REQUIRED_FILES, ADMIN_MAPPING_FILE)
-from app.models.database import get_db
+from app.models.storage import get_storage
+from app.models.submissions import submission_registry
+from app.services.mapping_service import invalidate_mapping_cache
+from app.services.report_service import get_class_feedback_data, get_submission_progress, report_cache, progress_cache
+from app.services.report_jobs import report_jobs, JOB_KINDS, BATCH_FORMATS, REPORT_TIMEOUT
 import subprocess
-from report_non_submission import generate_non_submission_report
 import os
 import csv
 import io
@@ -16,7 +19,6 @@ import base64
 import matplotlib.pyplot as plt
 from datetime import datetime
 import textwrap
-from report_generator import generate_feedback_report
 import shutil
 
 hod_bp = Blueprint('hod', __name__)
@@ -60,63 +62,9 @@ def hod_select():
         
         if action in ['view_pdf', 'download_pdf']:
             try:
-                normalized_input_semester = normalize_semester(semester)
-                update_mainratings()
-                
-                feedback_data = {}
-                staff_counter = 1
-                
-                # Query ratings from database and calculate averages
-                # Try multiple semester formats since data might be inconsistent
-                sem_variations = [
-                    normalized_input_semester,
-                    f"Semester {normalized_input_semester}",
-                    semester.strip()
-                ]
-                
-                client = get_db()
+                # Averages are computed by the database, one row per staff/subject
                 try:
-                    # Query ratings from database
-                    result = client.table('ratings')\
-                        .select('staff, subject, q1, q2, q3, q4, q5, q6, q7, q8, q9, q10')\
-                        .eq('department', department.strip())\
-                        .in_('semester', sem_variations)\
-                        .execute()
-                    
-                    # Group by staff and subject manually
-                    from collections import defaultdict
-                    grouped_data = defaultdict(lambda: {'q1': [], 'q2': [], 'q3': [], 'q4': [], 'q5': [], 
-                                                         'q6': [], 'q7': [], 'q8': [], 'q9': [], 'q10': []})
-                    
-                    for row in result.data:
-                        key = (row['staff'], row['subject'])
-                        for i in range(1, 11):
-                            grouped_data[key][f'q{i}'].append(row[f'q{i}'])
-                    
-                    # Calculate averages
-                    aggregated_results = []
-                    for (staff, subject), scores in grouped_data.items():
-                        avg_row = {'staff': staff, 'subject': subject}
-                        for i in range(1, 11):
-                            q_scores = scores[f'q{i}']
-                            avg_row[f'q{i}_avg'] = sum(q_scores) / len(q_scores) if q_scores else 0
-                        aggregated_results.append(avg_row)
-                    
-                    # Build feedback data
-                    for row in aggregated_results:
-                        staff_name = row['staff'].strip()
-                        subject_name = row['subject'].strip()
-                        scores = [row[f'q{i}_avg'] for i in range(1, 11)]
-                        
-                        key = f"{staff_name}_{subject_name}"
-                        feedback_data[key] = {
-                            'reference': f'S{staff_counter}',
-                            'staff_name': staff_name,
-                            'subject': subject_name,
-                            'scores': scores
-                        }
-                        staff_counter += 1
-                        
+                    feedback_data = get_class_feedback_data(department, semester)
                 except Exception as e:
                     current_app.logger.error(f"Database Error: {str(e)}")
                     flash(f"Error fetching ratings: {str(e)}", "danger")
@@ -126,38 +74,24 @@ def hod_select():
                     flash("No rating data found for the selected department and semester.", "danger")
                     return redirect(url_for('hod.hod_select'))
                 
-                # Generate PDF report
-                year = (int(normalized_input_semester) + 1) // 2
+                # Render in the report pool (or serve the cached PDF if ratings are unchanged)
                 try:
-                    pdf_path = generate_feedback_report(
-                        academic_year=str(datetime.now().year),
-                        branch=department,
-                        semester=semester,
-                        year=str(year),
-                        feedback_data=feedback_data
-                    )
-                    
-                    if not pdf_path or not os.path.exists(pdf_path):
-                        raise ValueError("PDF file was not generated properly")
-                    
-                    # Read the generated PDF
-                    with open(pdf_path, 'rb') as f:
-                        pdf_content = f.read()
+                    job = report_jobs.submit_feedback_report(department, semester, feedback_data)
+                    if not job.wait(REPORT_TIMEOUT):
+                        raise TimeoutError("Report generation timed out")
+                    if job.error:
+                        raise ValueError(job.error)
+                    filename, pdf_content, fingerprint = job.filename, job.pdf, job.fingerprint
                     
                     # Create response
                     response = make_response(pdf_content)
                     response.headers['Content-Type'] = 'application/pdf'
+                    response.set_etag(fingerprint)
                     
                     if action == 'download_pdf':
-                        response.headers['Content-Disposition'] = f'attachment; filename={os.path.basename(pdf_path)}'
+                        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
                     else:  # view_pdf
-                        response.headers['Content-Disposition'] = f'inline; filename={os.path.basename(pdf_path)}'
-                    
-                    # Clean up the temporary PDF file
-                    try:
-                        os.remove(pdf_path)
-                    except:
-                        pass
+                        response.headers['Content-Disposition'] = f'inline; filename={filename}'
                     
                     return response
                 
@@ -173,26 +107,19 @@ def hod_select():
         
         elif action == 'non_submission_report':
             try:
-                # Generate the non-submission report directly from database
-                pdf_path = generate_non_submission_report(department, semester)
-                
-                if not pdf_path or not os.path.exists(pdf_path):
-                    raise ValueError("PDF file was not generated properly")
+                # Generate the non-submission report in the report pool
+                job = report_jobs.submit_non_submission_report(department, semester)
+                if not job.wait(REPORT_TIMEOUT):
+                    raise TimeoutError("Report generation timed out")
+                if job.error:
+                    raise ValueError(job.error)
                 
-                # Read the generated PDF
-                with open(pdf_path, 'rb') as f:
-                    pdf_content = f.read()
+                filename, pdf_content = job.filename, job.pdf
                 
-                # Create response
+                # Serve the PDF straight from memory
                 response = make_response(pdf_content)
                 response.headers['Content-Type'] = 'application/pdf'
-                response.headers['Content-Disposition'] = f'inline; filename={os.path.basename(pdf_path)}'
-                
-                # Clean up the temporary PDF file
-                try:
-                    os.remove(pdf_path)
-                except:
-                    pass
+                response.headers['Content-Disposition'] = f'inline; filename={filename}'
                 
                 return response
                 
@@ -212,35 +139,24 @@ def hod_select():
                 if not os.path.exists(archive_dir):
                     os.makedirs(archive_dir)
                 
-                # Backup database file
-                db_path = os.path.join('data', 'feedback.db')
-                if os.path.exists(db_path):
-                    archive_db_path = os.path.join(archive_dir, 'feedback_backup.db')
-                    shutil.copy2(db_path, archive_db_path)
-                    current_app.logger.info(f"Database backed up to: {archive_db_path}")
+                # Backup database file (local storage only; Supabase keeps its own backups)
+                storage = get_storage()
+                archive_db_path = os.path.join(archive_dir, 'feedback_backup.db')
+                try:
+                    if storage.backup(archive_db_path):
+                        current_app.logger.info(f"Database backed up to: {archive_db_path}")
+                except Exception as e:
+                    current_app.logger.error(f"Error backing up database: {str(e)}")
                 
                 # Clear specific tables (keep: staff, subjects, semesters, departments)
-                client = get_db()
                 try:
-                    # Clear ratings table
-                    ratings_result = client.table('ratings').delete().neq('id', 0).execute()
-                    ratings_deleted = len(ratings_result.data) if ratings_result.data else 0
-                    current_app.logger.info(f"Deleted {ratings_deleted} rows from ratings table")
-                    
-                    # Clear submitted_feedback table
-                    submitted_result = client.table('submitted_feedback').delete().neq('id', 0).execute()
-                    submitted_deleted = len(submitted_result.data) if submitted_result.data else 0
-                    current_app.logger.info(f"Deleted {submitted_deleted} rows from submitted_feedback table")
-                    
-                    # Clear admin_mappings table
-                    mappings_result = client.table('admin_mappings').delete().neq('id', 0).execute()
-                    mappings_deleted = len(mappings_result.data) if mappings_result.data else 0
-                    current_app.logger.info(f"Deleted {mappings_deleted} rows from admin_mappings table")
-                    
-                    # Clear students table
-                    students_result = client.table('students').delete().neq('id', 0).execute()
-                    students_deleted = len(students_result.data) if students_result.data else 0
-                    current_app.logger.info(f"Deleted {students_deleted} rows from students table")
+                    deleted = storage.clear_cycle_data()
+                    for table, count in deleted.items():
+                        current_app.logger.info(f"Deleted {count} rows from {table} table")
+                    submission_registry.clear()
+                    invalidate_mapping_cache()
+                    report_cache.invalidate()
+                    progress_cache.invalidate()
                 except Exception as e:
                     current_app.logger.error(f"Error clearing tables: {str(e)}")
                     flash(f"Error clearing tables: {str(e)}", "danger")
@@ -285,3 +201,99 @@ def hod_select():
     return render_template('hod_select.html', 
                          departments=departments,
                          semesters=semesters)
+
+@hod_bp.route('/hod/progress', methods=['GET'])
+def submission_progress():
+    """Submitted/total counts per class, optionally filtered by department and semester."""
+    try:
+        classes = get_submission_progress(request.args.get('department'), request.args.get('semester'))
+    except Exception as e:
+        current_app.logger.error(f"Error loading submission progress: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error loading submission progress: {str(e)}'
+        }), 500
+    
+    total = sum(row['total'] for row in classes)
+    submitted = sum(row['submitted'] for row in classes)
+    return jsonify({
+        'success': True,
+        'classes': classes,
+        'total': total,
+        'submitted': submitted,
+        'pending': total - submitted
+    })
+
+def _job_payload(job):
+    payload = job.to_dict()
+    payload['status_url'] = url_for('hod.report_job_status', job_id=job.id)
+    payload['result_url'] = url_for('hod.report_job_result', job_id=job.id)
+    return payload
+
+@hod_bp.route('/hod/reports/jobs', methods=['POST'])
+def submit_report_job():
+    """
+    Queue a report for background rendering; poll status_url, then fetch result_url.
+    kind=batch renders every class (format=zip or pdf) and needs no department/semester.
+    """
+    data = request.get_json(silent=True) or request.form
+    kind = data.get('kind', 'feedback')
+    department = (data.get('department') or '').strip()
+    semester = (data.get('semester') or '').strip()
+    
+    if kind not in JOB_KINDS:
+        return jsonify({
+            'success': False,
+            'message': f"Unknown report kind: {kind}"
+        }), 400
+    fmt = data.get('format', 'zip')
+    if kind == 'batch' and fmt not in BATCH_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': f"Unknown batch format: {fmt}"
+        }), 400
+    if kind != 'batch' and (not department or not semester):
+        return jsonify({
+            'success': False,
+            'message': 'Please select both department and semester.'
+        }), 400
+    
+    try:
+        job = report_jobs.submit(kind, department, semester, fmt)
+    except Exception as e:
+        current_app.logger.error(f"Error submitting report job: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error submitting report job: {str(e)}'
+        }), 500
+    
+    payload = _job_payload(job)
+    payload['success'] = True
+    return jsonify(payload), 202
+
+@hod_bp.route('/hod/reports/jobs/<job_id>', methods=['GET'])
+def report_job_status(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired report job'}), 404
+    payload = _job_payload(job)
+    payload['success'] = True
+    return jsonify(payload)
+
+@hod_bp.route('/hod/reports/jobs/<job_id>/result', methods=['GET'])
+def report_job_result(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown or expired report job'}), 404
+    if not job.finished:
+        return jsonify({'success': False, 'message': 'Report is not ready yet', 'status': job.to_dict()['status']}), 409
+    if job.error:
+        return jsonify({'success': False, 'message': job.error}), 500
+    
+    response = make_response(job.pdf)
+    response.headers['Content-Type'] = job.content_type
+    disposition = 'attachment' if request.args.get('download') else 'inline'
+    response.headers['Content-Disposition'] = f'{disposition}; filename={job.filename}'
+    if job.fingerprint:
+        response.set_etag(job.fingerprint)
+    return response
@@ -0,0 +1,273 @@
+"""
+Native ASGI routes for the student hot path: '/', '/validate_regno' and
+'/feedback'.
+
+Under WsgiToAsgi every blocking Supabase call holds one of a few executor
+threads, which caps how many logins can wait on the database at once. These
+handlers await the async storage instead, so concurrent logins only cost a
+coroutine each. Everything else (admin, HOD, static files) is served by the
+Flask app mounted underneath.
+
+Pages are still rendered by Flask: the database work happens first, then the
+template, flash messages and session cookie are produced inside a Flask
+request context, so sessions are shared with the mounted app unchanged.
+"""
+
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import JSONResponse, Response
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask, render_template, redirect, url_for, flash
+from app.models.async_storage import get_async_storage
+from app.models.submissions import submission_registry
+from app.services.mapping_service import (mapping_cache, mapping_cache_key, mapping_version_due,
+                                          check_mapping_version)
+from app.services.feedback_service import (batch_range_exceeded, collect_rating_rows,
+                                           mapping_rows, mapping_semester_variations,
+                                           rating_payload)
+from app.services.startup import warm_up, warm_up_async, shutdown
+from utils import normalize_regno
+from config import FEEDBACK_QUESTIONS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def flask_response(request: Request, view) -> Response:
+    """Run `view` (which may flash, render and redirect) in a Flask request context."""
+    flask_app: Flask = request.app.state.flask_app
+    base_url = f"{request.url.scheme}://{request.url.netloc}{request.scope.get('root_path', '')}"
+    headers = {'Cookie': request.headers['cookie']} if 'cookie' in request.headers else {}
+
+    with flask_app.test_request_context(request.url.path, base_url=base_url,
+                                        query_string=request.url.query,
+                                        method=request.method, headers=headers):
+        # process_response saves the session (consumed or new flash messages)
+        response = flask_app.process_response(flask_app.make_response(view()))
+
+    body = response.get_data()
+    out = Response(content=body, status_code=response.status_code)
+    out.raw_headers = [(key.lower().encode('latin-1'), value.encode('latin-1'))
+                       for key, value in response.headers.items()
+                       if key.lower() != 'content-length']
+    out.raw_headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    return out
+
+async def get_login_info(registerno: str):
+    """Async equivalent of app.get_login_info_db."""
+    reg_num = normalize_regno(registerno)
+    try:
+        row = await get_async_storage().login_lookup(reg_num)
+    except Exception as e:
+        logger.error(f"Error during login lookup: {e}")
+        return None
+    if not row:
+        return None
+
+    login_info = {
+        'registerno': row['registerno'],
+        'department': row['department'],
+        'semester': row['semester'],
+        'submitted': bool(row['submitted']),
+        'min_regno': row['min_regno'],
+        'max_regno': row['max_regno']
+    }
+    if login_info['submitted']:
+        submission_registry.add(reg_num)
+    return login_info
+
+async def has_submitted_feedback(registerno: str) -> bool:
+    """Async equivalent of app.has_submitted_feedback_db."""
+    reg_num = normalize_regno(registerno)
+    if submission_registry.sync_due():
+        # Reconciling reads the database with the sync client; keep it off the loop
+        if await asyncio.to_thread(submission_registry.contains, reg_num):
+            return True
+    elif reg_num in submission_registry:
+        return True
+    if submission_registry.is_warm:
+        return False
+
+    try:
+        submitted = await get_async_storage().has_submitted(reg_num)
+    except Exception as e:
+        logger.error(f"Error checking feedback submission: {e}")
+        return False
+    if submitted:
+        submission_registry.add(reg_num)
+    return submitted
+
+async def load_admin_mapping(department: str, semester: str):
+    """Async equivalent of app.load_admin_mapping_db."""
+    key = mapping_cache_key(department, semester)
+    if mapping_version_due():
+        # The version check reads the database with the sync client; keep it off the loop
+        await asyncio.to_thread(check_mapping_version)
+    mappings = mapping_cache.get(key)
+    if mappings is not None:
+        return mappings
+
+    try:
+        rows = await get_async_storage().load_mappings(department, mapping_semester_variations(key[1]))
+    except Exception as e:
+        logger.error(f"Error loading admin mappings: {e}")
+        return []
+    mappings = mapping_rows(rows)
+    mapping_cache.set(key, mappings)
+    return mappings
+
+async def append_ratings(rating_rows, submission_token=None):
+    """Async equivalent of app.append_ratings_db."""
+    if not rating_rows:
+        return None
+
+    registerno = rating_rows[0]['registerno']
+    try:
+        status = await get_async_storage().submit_feedback(
+            registerno, submission_token, rating_payload(rating_rows)
+        )
+    except Exception as e:
+        logger.error(f"Error appending ratings for {registerno}: {e}")
+        return None
+
+    submission_registry.add(registerno)
+    return status
+
+@router.post('/validate_regno')
+async def validate_regno(request: Request):
+    form = await request.form()
+    registerno = (form.get('registerno') or '').strip()
+    if not registerno:
+        return JSONResponse({'valid': False, 'message': 'Please enter a registration number'})
+
+    registerno = ''.join(filter(str.isdigit, registerno))
+    if not registerno:
+        return JSONResponse({'valid': False,
+                             'message': 'Registration number must contain at least one digit'})
+    if int(registerno) < 1:
+        return JSONResponse({'valid': False,
+                             'message': 'Registration number must be a positive number'})
+
+    login_info = await get_login_info(registerno)
+    if not login_info:
+        return JSONResponse({'valid': False, 'message': 'Registration number not found'})
+    if login_info['submitted']:
+        return JSONResponse({'valid': False,
+                             'message': 'Feedback already submitted for this registration number'})
+    if batch_range_exceeded(login_info):
+        return JSONResponse({'valid': False,
+                             'message': 'Registration number range exceeds limit for your batch'})
+
+    return JSONResponse({'valid': True, 'message': 'Registration number validated successfully!'})
+
+def _login_page(message=None, category='danger'):
+    def view():
+        if message:
+            flash(message, category)
+        return render_template('student_login.html')
+    return view
+
+@router.api_route('/', methods=['GET', 'POST'])
+async def student_login(request: Request):
+    if request.method != 'POST':
+        return flask_response(request, _login_page())
+
+    form = await request.form()
+    registerno = form.get('registerno') or ''
+    if not registerno:
+        return flask_response(request, _login_page("Please enter your registration number."))
+
+    registerno = ''.join(filter(str.isdigit, registerno))
+    if not registerno:
+        return flask_response(request, _login_page("Registration number must contain at least one digit."))
+    if int(registerno) < 1:
+        return flask_response(request, _login_page("Registration number must be a positive number."))
+
+    login_info = await get_login_info(registerno)
+    if not login_info:
+        return flask_response(request, _login_page("Registration number not found. Please try again."))
+    if batch_range_exceeded(login_info):
+        return flask_response(request, _login_page("Registration number range exceeds limit for your batch."))
+    if login_info['submitted']:
+        return flask_response(request, _login_page(
+            "Feedback already submitted for this registration number.", 'info'))
+
+    def view():
+        flash("Registration number validated successfully!", 'success')
+        return redirect(url_for('feedback', department=login_info.get('department'),
+                                semester=login_info.get('semester'), registerno=registerno))
+    return flask_response(request, view)
+
+def _redirect(endpoint, message, category, **values):
+    def view():
+        flash(message, category)
+        return redirect(url_for(endpoint, **values))
+    return view
+
+@router.api_route('/feedback', methods=['GET', 'POST'])
+async def feedback(request: Request):
+    department = request.query_params.get('department')
+    semester = request.query_params.get('semester')
+    registerno = request.query_params.get('registerno')
+
+    if not department or not semester or not registerno:
+        return flask_response(request, _redirect(
+            'student_login', "Missing department, semester, or registration number.", 'danger'))
+
+    # POSTs skip this check: submit_feedback() does it atomically so that a
+    # retried submission can still be recognised as the original one
+    if request.method == 'GET' and await has_submitted_feedback(registerno):
+        return flask_response(request, _redirect(
+            'student_login', "Feedback already submitted. You have already registered.", 'info'))
+
+    mappings = await load_admin_mapping(department, semester)
+    if not mappings:
+        return Response(f"<h2>No staff/subject mappings found for {department} - {semester}.</h2>",
+                        media_type='text/html')
+
+    class_args = {'department': department, 'semester': semester, 'registerno': registerno}
+
+    if request.method == 'POST':
+        form = await request.form()
+        rating_rows, error = collect_rating_rows(form, mappings, department, semester, registerno)
+        if error:
+            return flask_response(request, _redirect('feedback', error, 'danger', **class_args))
+
+        status = await append_ratings(rating_rows, form.get('submission_token') or None)
+        if status == 'duplicate':
+            return flask_response(request, _redirect(
+                'student_login', "Feedback already submitted. You have already registered.", 'info'))
+        if status is None:
+            return flask_response(request, _redirect(
+                'feedback', "Could not save your feedback. Please try again.", 'danger', **class_args))
+        return flask_response(request, _redirect(
+            'student_login', "Feedback submitted successfully. Thank you!", 'success'))
+
+    return flask_response(request, lambda: render_template(
+        'feedback.html',
+        department=department,
+        semester=semester,
+        mappings=mappings,
+        questions=FEEDBACK_QUESTIONS,
+        submission_token=uuid.uuid4().hex
+    ))
+
+def create_asgi_app(flask_app: Flask) -> FastAPI:
+    """ASGI app serving the student routes natively and everything else through Flask."""
+
+    @asynccontextmanager
+    async def lifespan(api: FastAPI):
+        # Runs once per uvicorn worker, before it accepts connections
+        warm_up(flask_app)
+        await warm_up_async()
+        yield
+        shutdown()
+
+    api = FastAPI(docs_url=None, redoc_url=None, openapi_url=None, lifespan=lifespan)
+    api.state.flask_app = flask_app
+    api.include_router(router)
+    api.mount('/', WsgiToAsgi(flask_app))
+    return api
@@ -0,0 +1,100 @@
+"""
+SQLiteStorage against an in-memory database.
+
+The SQLite backend re-implements the Supabase RPC functions (submit_feedback,
+refresh_batch_range, login_lookup, ...) in SQL, so these tests pin down the
+behaviour the rest of the app relies on.
+"""
+
+import unittest
+from unittest import mock
+from app.models.storage import SQLiteStorage
+from app.models.submissions import SubmissionRegistry
+
+def rating(registerno, department='CSE', semester='3', staff='Alice', subject='Maths', score=4):
+    row = {'registerno': registerno, 'department': department, 'semester': semester,
+           'staff': staff, 'subject': subject, 'average': float(score)}
+    row.update({f'q{i}': score for i in range(1, 11)})
+    return row
+
+class SQLiteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = SQLiteStorage(':memory:')
+
+    def add_class(self, registernos, department='CSE', semester='3'):
+        self.storage.insert_students([(regno, department, semester) for regno in registernos])
+        self.storage.refresh_batch_range(department, semester)
+
+    def batch_range(self, department='CSE', semester='3'):
+        for row in self.storage.batch_ranges():
+            if (row['department'], row['semester']) == (department, semester):
+                return row
+        return None
+
+    def test_submit_feedback_created_replayed_duplicate(self):
+        self.add_class(['101', '102'])
+
+        self.assertEqual(self.storage.submit_feedback('101', 'token-a', [rating('101')]), 'created')
+        self.assertEqual(self.storage.submit_feedback('101', 'token-a', [rating('101')]), 'replayed')
+        self.assertEqual(self.storage.submit_feedback('101', 'token-b', [rating('101')]), 'duplicate')
+        self.assertEqual(self.storage.submit_feedback('101', None, [rating('101')]), 'duplicate')
+
+        # Only the first submission stored ratings and counted towards progress
+        self.assertTrue(self.storage.has_submitted('101'))
+        self.assertFalse(self.storage.has_submitted('102'))
+        aggregates = self.storage.rating_aggregates('CSE', ['3'])
+        self.assertEqual([row['response_count'] for row in aggregates], [1])
+        self.assertEqual(self.batch_range()['submitted_count'], 1)
+
+    def test_refresh_batch_range_after_deleting_last_student(self):
+        self.add_class(['101'])
+        self.assertEqual(self.batch_range()['student_count'], 1)
+
+        self.assertTrue(self.storage.delete_student('101', 'CSE', '3'))
+        self.storage.refresh_batch_range('CSE', '3')
+
+        row = self.batch_range()
+        self.assertEqual(row['student_count'], 0)
+        self.assertEqual(row['submitted_count'], 0)
+        self.assertIsNone(row['min_regno'])
+        self.assertIsNone(row['max_regno'])
+        # The failed-refresh case used to leave a transaction (and the write lock) open
+        self.assertFalse(self.storage.conn.in_transaction)
+
+    def test_login_lookup_batch_range(self):
+        self.add_class(['7305', '7301', '7310'])
+        self.add_class(['9001'], semester='5')
+
+        info = self.storage.login_lookup('7305')
+        self.assertEqual((info['department'], info['semester']), ('CSE', '3'))
+        self.assertEqual((info['min_regno'], info['max_regno']), (7301, 7310))
+        self.assertFalse(info['submitted'])
+
+        self.storage.submit_feedback('7305', None, [rating('7305')])
+        self.assertTrue(self.storage.login_lookup('7305')['submitted'])
+        self.assertIsNone(self.storage.login_lookup('1234'))
+
+    def test_registry_reconcile_after_clear_cycle_data(self):
+        self.add_class(['101', '102', '201'])
+        self.storage.submit_feedback('101', None, [rating('101')])
+        self.storage.submit_feedback('102', None, [rating('102')])
+
+        with mock.patch('app.models.submissions.get_storage', return_value=self.storage):
+            registry = SubmissionRegistry()
+            self.assertTrue(registry.warm())
+            self.assertIn('101', registry)
+
+            # Archive (possibly by another worker), then a submission in the new cycle
+            # that lands in the same second as the old watermark
+            self.storage.clear_cycle_data()
+            self.add_class(['201'])
+            self.storage.submit_feedback('201', None, [rating('201')])
+
+            self.assertTrue(registry.reconcile())
+            self.assertNotIn('101', registry)
+            self.assertNotIn('102', registry)
+            self.assertIn('201', registry)
+            self.assertEqual(len(registry), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -58,24 +58,22 @@ def is_encrypted(value):
 
 def read_csv_as_list(filename):
     """
-    UPDATED: Return a list of values from the database instead of CSV file.
+    UPDATED: Return a list of values from the reference-data cache instead of CSV file.
     Kept for backward compatibility.
     """
-    client = _get_db()
+    from app.services.reference_data import get_reference_list
     
     # Determine which table to query based on filename
     if 'departments' in filename.lower():
-        result = client.table('departments').select('name').order('name').execute()
+        return get_reference_list('departments')
     elif 'semesters' in filename.lower():
-        result = client.table('semesters').select('name').order('name').execute()
+        return get_reference_list('semesters')
     elif 'staff' in filename.lower():
-        result = client.table('staff').select('name').order('name').execute()
+        return get_reference_list('staff')
     elif 'subject' in filename.lower():
-        result = client.table('subjects').select('name').order('name').execute()
+        return get_reference_list('subjects')
     else:
         return []
-    
-    return [row['name'] for row in result.data]
 
 def load_admin_mapping(department, semester):
     """
@@ -222,40 +220,34 @@ def has_submitted_feedback(registerno):
 
 def update_mainratings():
     """
-    UPDATED: Aggregate ratings from database.
-    This function is kept for compatibility but now works with database.
+    UPDATED: Return aggregated ratings from the rating_aggregates summary table.
+    The summary is maintained incrementally by submit_feedback(), so this no
+    longer scans the ratings table.
     """
     aggregated = {}
     
     client = _get_db()
-    result = client.table('ratings')\
-        .select('department, semester, staff, subject, q1, q2, q3, q4, q5, q6, q7, q8, q9, q10, average')\
+    result = client.table('rating_aggregates')\
+        .select('department, semester, staff, subject, response_count, '
+                'q1_sum, q2_sum, q3_sum, q4_sum, q5_sum, q6_sum, q7_sum, q8_sum, q9_sum, q10_sum, '
+                'q1_sq_sum, q2_sq_sum, q3_sq_sum, q4_sq_sum, q5_sq_sum, '
+                'q6_sq_sum, q7_sq_sum, q8_sq_sum, q9_sq_sum, q10_sq_sum, average_sum')\
         .execute()
     
     for row in result.data:
-        dep, sem, staff, subject = row['department'], row['semester'], row['staff'], row['subject']
-        key = (dep, sem, staff, subject)
-        
-        if key not in aggregated:
-            aggregated[key] = {
-                'q_sums': [0.0] * 10,
-                'count': 0,
-                'total_avg': 0.0
-            }
-        
-        # Add individual question ratings
-        for i in range(1, 11):
-            aggregated[key]['q_sums'][i-1] += row[f'q{i}']
-        
-        aggregated[key]['total_avg'] += row['average']
-        aggregated[key]['count'] += 1
+        key = (row['department'], row['semester'], row['staff'], row['subject'])
+        aggregated[key] = {
+            'q_sums': [row[f'q{i}_sum'] for i in range(1, 11)],
+            'q_sq_sums': [row[f'q{i}_sq_sum'] for i in range(1, 11)],
+            'count': row['response_count'],
+            'total_avg': row['average_sum']
+        }
     
-    # Store aggregated results (you can save this to a table if needed)
     return aggregated
 
 def normalize_semester(semester):
-    """Normalize semester string by removing 'semester' prefix if present."""
+    """Normalize semester string by removing any 'semester' prefixes (e.g. 'Semester Semester 3')."""
     semester = semester.strip()
-    if semester.lower().startswith("semester"):
+    while semester.lower().startswith("semester"):
         semester = semester[len("semester"):].strip()
     return semester